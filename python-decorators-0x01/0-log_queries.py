@@ -1,27 +1,394 @@
 #!/usr/bin/python3
+import re
+import json
+import sys
+import time
+import queue
+import random
+import bisect
+import hashlib
 import sqlite3
 import functools
+import threading
+import collections
+import connection_provider
 
+# Latency histogram buckets in seconds: 1us to ~100s in 10% steps, so any
+# reported percentile is within 10% of the true value.
+BUCKETS = [1e-6 * 1.1 ** i for i in range(194)]
 
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+config = {
+    "enabled": True,
+    "sample_rate": 1.0,
+    # Calls slower than this many seconds are EXPLAINed and kept in the slow
+    # query log regardless of sampling; None disables the slow-query mode.
+    "slow_threshold": None,
+    "explain_db": "users.db",
+    # Longest the read APIs (query_stats() etc.) wait for queued events to
+    # be aggregated before answering with what has been aggregated so far.
+    "flush_timeout": 5.0,
+}
+hooks = []
+
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\S+)")
+_SUBQUERY = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\S+)")
+_NOT_ALIASES = ("where", "join", "inner", "left", "right", "cross", "outer", "on",
+                "group", "order", "limit", "union", "natural", "using", "having",
+                "window", "except", "intersect", "indexed", "not")
+_TABLE_NAME = r"[\w.\"`\[\]]+(?:\s+(?:AS\s+)?(?!(?:%s)\b)\w+)?" % "|".join(_NOT_ALIASES)
+_TABLE_REFS = re.compile(r"\b(?:FROM|JOIN)\s+(%s(?:\s*,\s*%s)*)" % (_TABLE_NAME, _TABLE_NAME),
+                         re.IGNORECASE)
+
+
+def register_hook(hook):
+    """
+    hook(event) is called on the background flush thread for every sampled
+    or slow query. event has query, shape, params_fingerprint, duration,
+    rows, caller, error, sampled, slow and db_path keys.
+    """
+    hooks.append(hook)
+    return hook
+
+
+def print_hook(event):
+    print(f"Executing query: {event['query']} ({event['duration'] * 1000:.2f} ms)")
+
+
+def query_shape(query):
+    """
+    Normalizes a query so calls that differ only in literals aggregate
+    together: literals become ?, IN lists collapse and whitespace is folded.
+    """
+    shape = _LITERAL.sub("?", query)
+    shape = _IN_LIST.sub("(?)", shape)
+    return " ".join(shape.split()).rstrip(";")
+
+
+def params_fingerprint(params):
+    if params is None:
+        return None
+    return hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.errors = 0
+
+    def add(self, duration, rows=None, error=False):
+        self.counts[bisect.bisect_left(BUCKETS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.rows += rows or 0
+        self.errors += bool(error)
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        rank = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS[i] if i < len(BUCKETS) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rows": self.rows,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+_slow_log = collections.deque(maxlen=100)
+_slow_log_lock = threading.Lock()
+# Events waiting for the flush thread. When it falls behind, new events
+# are dropped (and counted) rather than blocking or growing without bound.
+QUEUE_SIZE = 10000
+_events = queue.Queue(maxsize=QUEUE_SIZE)
+_dropped = 0
+_dropped_lock = threading.Lock()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def table_aliases(query):
+    """
+    Maps the aliases in a query's FROM/JOIN clauses to their table names,
+    e.g. {"u": "users"} for "SELECT * FROM users u".
+    """
+    aliases = {}
+    for match in _TABLE_REFS.finditer(_LITERAL.sub("?", query)):
+        for ref in match.group(1).split(","):
+            words = ref.split()
+            if len(words) > 1:
+                aliases[words[-1]] = words[0].split(".")[-1].strip('"`[]')
+    return aliases
+
+
+def explain(query, params=None, db_path=None):
+    """
+    Returns (plan, full_table_scans) for a query: the EXPLAIN QUERY PLAN
+    detail lines and the tables read by a SCAN that uses no index. Aliases
+    are reported as their table; constant rows and scans of subqueries or
+    CTEs (whose own table scans are listed separately) are left out.
+    """
+    with connection_provider.get_provider(db_path or config["explain_db"]).connection() as conn:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+    plan = [row[-1] for row in rows]
+    aliases = table_aliases(query)
+    subqueries = {"CONSTANT"}
+    scans = []
+    for detail in plan:
+        match = _SUBQUERY.match(detail)
+        if match:
+            subqueries.add(match.group(1))
+            continue
+        match = _SCAN.match(detail)
+        if match and "INDEX" not in detail:
+            name = match.group(1)
+            if name in subqueries or name.startswith("("):
+                continue
+            scans.append(aliases.get(name, name))
+    return plan, scans
+
+
+def _database_path(conn):
+    # File behind a connection's main database ("" for in-memory ones).
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return path
+    return None
+
+
+def _record_slow(event, params):
+    try:
+        if event["db_path"] == "":
+            raise ValueError("cannot EXPLAIN a query on an in-memory database")
+        event["plan"], event["full_table_scans"] = explain(event["query"], params,
+                                                           event["db_path"])
+    except Exception as e:
+        event["plan"], event["full_table_scans"] = None, None
+        event["explain_error"] = repr(e)
+    with _slow_log_lock:
+        _slow_log.append(event)
+
+
+def _record(event):
+    if event["sampled"]:
+        with _histograms_lock:
+            histogram = _histograms.get(event["shape"])
+            if histogram is None:
+                histogram = _histograms[event["shape"]] = LatencyHistogram()
+            histogram.add(event["duration"], event["rows"], event["error"] is not None)
+    for hook in list(hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            print(f"Query hook {hook!r} failed: {e}", file=sys.stderr)
+
+
+def _flush_loop():
+    while True:
+        item = _events.get()
+        if isinstance(item, threading.Event):
+            item.set()
+            continue
+        event = item
+        params = event.pop("params")
+        event["shape"] = query_shape(event["query"])
+        event["params_fingerprint"] = params_fingerprint(params)
+        if event["slow"]:
+            _record_slow(event, params)
+        _record(event)
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        with _flusher_lock:
+            if _flusher is None or not _flusher.is_alive():
+                _flusher = threading.Thread(target=_flush_loop, daemon=True,
+                                            name="query-instrumentation")
+                _flusher.start()
+
+
+def flush(timeout=None):
+    """
+    Blocks until every event queued so far has been aggregated, or for at
+    most timeout seconds. Returns whether the flush completed.
+    """
+    _ensure_flusher()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    done = threading.Event()
+    try:
+        _events.put(done, timeout=timeout)
+    except queue.Full:
+        return False
+    return done.wait(None if deadline is None else max(0, deadline - time.monotonic()))
+
+
+def dropped_events():
+    """
+    Returns how many events were discarded because the queue was full.
+    """
+    return _dropped
+
+
+def query_stats():
+    """
+    Returns {query shape: {count, errors, rows, mean, max, p50, p95, p99}},
+    with durations in seconds.
+    """
+    flush(config["flush_timeout"])
+    with _histograms_lock:
+        return {shape: h.summary() for shape, h in _histograms.items()}
+
+
+def slow_queries():
+    """
+    Returns the most recent slow calls, oldest first, each with its plan
+    and full_table_scans.
+    """
+    flush(config["flush_timeout"])
+    with _slow_log_lock:
+        return list(_slow_log)
+
+
+def dump_slow_queries(path=None):
+    """
+    Serializes the slow query log as JSON, writing it to path if given.
+    """
+    text = json.dumps(slow_queries(), indent=2, default=str)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return text
+
+
+def set_slow_log_size(size):
+    global _slow_log
+    with _slow_log_lock:
+        _slow_log = collections.deque(_slow_log, maxlen=size)
+
+
+def reset_stats():
+    global _dropped
+    flush(config["flush_timeout"])
+    with _histograms_lock:
+        _histograms.clear()
+    with _slow_log_lock:
+        _slow_log.clear()
+    with _dropped_lock:
+        _dropped = 0
+
+
+def _query_and_params(args, kwargs):
+    # Accepts both f(query, params) and f(conn, query, params) signatures.
+    if args and isinstance(args[0], sqlite3.Connection):
+        args = args[1:]
+    if 'query' in kwargs:
+        query = kwargs['query']
+    elif len(args) > 0:
+        query = args[0]
+    else:
+        query = 'No query provided'
+    params = kwargs.get('params')
+    if params is None and len(args) > 1:
+        params = args[1]
+    return query, params
+
+
+def log_queries(func=None, *, db_path=None):
+    """
+    Instruments a function whose first argument (or `query` keyword) is the
+    SQL it runs. Sampled calls (config["sample_rate"]) are queued with their
+    duration, row count, parameter fingerprint and caller; a background
+    thread aggregates them into per-shape histograms (query_stats()) and
+    calls registered hooks. Setting config["enabled"] = False reduces the
+    wrapper to a single dict lookup. If the background thread falls more
+    than QUEUE_SIZE events behind, further events are dropped and counted
+    (dropped_events()) so the instrumented call never blocks.
+    With config["slow_threshold"] set, every call is timed and any slower
+    call is queued even if not sampled; the background thread captures its
+    EXPLAIN QUERY PLAN into the slow query log (slow_queries()). The plan is
+    taken on the database the call used: db_path if given
+    (@log_queries(db_path="app.db")), else the file behind a
+    sqlite3.Connection passed as the first argument, else
+    config["explain_db"].
+    """
+    if func is None:
+        return functools.partial(log_queries, db_path=db_path)
 
-def log_queries(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        if 'query' in kwargs:
-            query = kwargs['query']
-        
-        elif len(args) > 0:
-            query = args[0]
-        
-        else:
-            query = 'No query provided'
-
-        
-        print(f"Executing query: {query}")
-        return func(*args, **kwargs)
-    
-    return wrapper
+        global _dropped
+        if not config["enabled"]:
+            return func(*args, **kwargs)
+        sample_rate = config["sample_rate"]
+        sampled = sample_rate >= 1.0 or random.random() < sample_rate
+        slow_threshold = config["slow_threshold"]
+        if not sampled and slow_threshold is None:
+            return func(*args, **kwargs)
+
+        error = None
+        result = None
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            slow = slow_threshold is not None and duration > slow_threshold
+            if sampled or slow:
+                caller = sys._getframe(1)
+                query, params = _query_and_params(args, kwargs)
+                path = db_path
+                if slow and path is None and args and isinstance(args[0], sqlite3.Connection):
+                    try:
+                        path = _database_path(args[0])
+                    except sqlite3.Error:
+                        pass
+                _ensure_flusher()
+                event = {
+                    "query": query,
+                    "params": params,
+                    "duration": duration,
+                    "rows": len(result) if isinstance(result, list) else None,
+                    "caller": f"{caller.f_code.co_filename}:{caller.f_lineno} ({caller.f_code.co_name})",
+                    "function": func.__qualname__,
+                    "error": error,
+                    "sampled": sampled,
+                    "slow": slow,
+                    "db_path": path,
+                }
+                try:
+                    _events.put_nowait(event)
+                except queue.Full:
+                    with _dropped_lock:
+                        _dropped += 1
 
+    return wrapper
 
 
 @log_queries
@@ -36,5 +403,7 @@ def fetch_all_users(query):
 
 
 if __name__ == "__main__":
+    register_hook(print_hook)
     users = fetch_all_users(query="SELECT * FROM users")
-    print(users)
\ No newline at end of file
+    print(users)
+    print(query_stats())
@@ -1,20 +1,5 @@
 #!/usr/bin/python3
-import sqlite3
-import functools
-
-
-
-
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        con = sqlite3.connect('users.db')
-        try:
-            result = func(con, *args, **kwargs)
-        finally:
-            con.close()
-        return result
-    return wrapper
+from connection_provider import with_db_connection
 
 
 @with_db_connection
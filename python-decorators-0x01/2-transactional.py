@@ -1,30 +1,47 @@
 #!/usr/bin/python3
 import sqlite3
 import functools
+from connection_provider import with_db_connection
 
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
+commit_hooks = []
+
+_WRITE_ACTIONS = (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE)
+
+
+def register_commit_hook(hook):
+    """
+    hook(tables) is called after every transactional commit with the set of
+    (lower-cased) table names the transaction wrote to.
+    """
+    commit_hooks.append(hook)
+    return hook
 
 
 def transactional(func):
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        written = set()
+
+        def track_writes(action, table, *_):
+            if action in _WRITE_ACTIONS and table:
+                written.add(table.lower())
+            return sqlite3.SQLITE_OK
+
+        conn.set_authorizer(track_writes)
         try:
             result = func(conn, *args, **kwargs)
-            conn.commit()   
-            return result
+            conn.commit()
         except Exception as e:
-            conn.rollback()  
+            conn.rollback()
             raise e
+        finally:
+            conn.set_authorizer(None)
+
+        if written:
+            for hook in commit_hooks:
+                hook(written)
+        return result
     return wrapper
 
 
@@ -1,34 +1,153 @@
 #!/usr/bin/python3
 import time
+import random
+import asyncio
 import sqlite3
 import functools
+import threading
+from collections import deque
+from connection_provider import with_db_connection
 
+# sqlite3.OperationalError messages worth retrying; anything else (syntax
+# errors, missing tables, constraint failures) fails on the first attempt.
+TRANSIENT_MESSAGES = (
+    "database is locked",
+    "database table is locked",
+    "database is busy",
+    "disk i/o error",
+    "unable to open database file",
+)
+# SQLITE_BUSY and SQLITE_LOCKED, exposed as sqlite_errorcode on Python 3.11+.
+TRANSIENT_ERRORCODES = {5, 6}
+# MySQL server/client error numbers (args[0] of MySQLdb, PyMySQL and
+# aiomysql errors) for an unreachable or overloaded server: too many
+# connections, shutdown in progress, lock wait timeout, deadlock, can't
+# connect, server gone away, lost connection.
+TRANSIENT_MYSQL_ERRORS = {1040, 1053, 1205, 1213, 2002, 2003, 2006, 2013, 2055}
+_MYSQL_MODULES = ("MySQLdb", "pymysql", "aiomysql")
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
 
+def is_transient(exc):
+    """
+    Returns True for errors a retry can fix: sqlite lock/busy errors, MySQL
+    connection and lock errors, and dropped or timed-out connections.
+    """
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if type(exc).__module__.startswith(_MYSQL_MODULES):
+        return bool(exc.args) and exc.args[0] in TRANSIENT_MYSQL_ERRORS
+    if isinstance(exc, sqlite3.OperationalError):
+        if getattr(exc, "sqlite_errorcode", None) in TRANSIENT_ERRORCODES:
+            return True
+        message = str(exc).lower()
+        return any(m in message for m in TRANSIENT_MESSAGES)
+    return False
+
+
+class RetryBudget:
+    """
+    Caps retries at ratio * calls plus min_retries over a sliding window,
+    process-wide. During an outage every call fails, the budget runs dry
+    and callers fail fast instead of multiplying load on the database.
+    """
+
+    def __init__(self, ratio=0.2, min_retries=10, window=10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self.stats = {"calls": 0, "retries": 0, "exhausted": 0}
+        self._calls = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        horizon = now - self.window
+        for events in (self._calls, self._retries):
+            while events and events[0] < horizon:
+                events.popleft()
+
+    def record_call(self):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._calls.append(now)
+            self.stats["calls"] += 1
+
+    def try_retry(self):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._calls):
+                self.stats["exhausted"] += 1
+                return False
+            self._retries.append(now)
+            self.stats["retries"] += 1
+            return True
+
+
+default_budget = RetryBudget()
+
+
+def backoff(attempt, delay, max_delay, jitter=True):
+    """
+    Exponential backoff for the given 1-based attempt. With jitter the pause
+    is drawn uniformly from [0, cap] so concurrent callers spread out.
+    """
+    cap = min(max_delay, delay * 2 ** (attempt - 1))
+    return random.uniform(0, cap) if jitter else cap
+
+
+def retry_on_failure(retries=3, delay=2, max_delay=30, jitter=True,
+                     retry_on=is_transient, budget=default_budget):
+    """
+    Makes up to `retries` attempts, pausing with exponential backoff and
+    jitter between them. Only errors for which retry_on(exc) is true are
+    retried, and only while the shared budget allows; pass budget=None to
+    disable it. Coroutine functions are retried with asyncio.sleep so the
+    event loop is not blocked.
+    """
+    def should_retry(attempt, e):
+        if attempt >= retries or not retry_on(e):
+            return None
+        if budget is not None and not budget.try_retry():
+            print(f"Attempt {attempt} failed: {e}. Retry budget exhausted")
+            return None
+        pause = backoff(attempt, delay, max_delay, jitter)
+        print(f"Attempt {attempt} failed: {e}. Retrying in {pause:.2f}s...")
+        return pause
 
-def retry_on_failure(retries=3, delay=2):
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if budget is not None:
+                    budget.record_call()
+                attempt = 1
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        pause = should_retry(attempt, e)
+                        if pause is None:
+                            raise
+                    await asyncio.sleep(pause)
+                    attempt += 1
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(1, retries + 1):
+            if budget is not None:
+                budget.record_call()
+            attempt = 1
+            while True:
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    last_exception = e
-                    print(f"Attempt {attempt} failed: {e}. Retrying in {delay}s...")
-                    time.sleep(delay)
-            raise last_exception
+                    pause = should_retry(attempt, e)
+                    if pause is None:
+                        raise
+                time.sleep(pause)
+                attempt += 1
         return wrapper
     return decorator
 
@@ -1,45 +1,696 @@
 #!/usr/bin/python3
+import os
+import re
+import asyncio
+import inspect
+import sys
+import pickle
+import random
 import time
 import sqlite3
+import weakref
 import functools
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from connection_provider import get_provider, with_db_connection
 
-query_cache = {}
+transactional = __import__('2-transactional')
 
+_MISSING = object()
+_ALL_TABLES = "*"
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN)\s+((?:[\w.\"`\[\]]+\s*(?:AS\s+\w+\s*|\w+\s*)?,\s*)*[\w.\"`\[\]]+)",
+    re.IGNORECASE,
+)
+_TABLE_ALIAS_KEYWORDS = {"where", "join", "inner", "left", "right", "cross", "outer",
+                         "on", "group", "order", "limit", "union", "natural", "using"}
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
+
+def normalize_sql(query):
+    """
+    Collapses whitespace outside string literals and drops trailing
+    semicolons, so formatting differences share a cache entry.
+    """
+    parts = _QUOTED.split(query.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "".join(parts)
+
+
+def _freeze(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params)
+
+
+def make_cache_key(query, params=None):
+    return normalize_sql(query), _freeze(params)
+
+
+def tables_read(query):
+    """
+    Best-effort set of (lower-cased) tables a SELECT reads from. Returns
+    {"*"} when none can be found, so the entry is dropped on any write.
+    """
+    text = _STRING_LITERAL.sub("''", query)
+    tables = set()
+    for match in _TABLE_REF.finditer(text):
+        for ref in match.group(1).split(","):
+            name = ref.split()[0].strip('"`[]')
+            if name.startswith("("):
+                continue
+            tables.add(name.split(".")[-1].strip('"`[]').lower())
+    tables.discard("")
+    tables -= _TABLE_ALIAS_KEYWORDS
+    return tables or {_ALL_TABLES}
+
+
+def _estimate_size(obj):
+    # Rough deep size of a result set: containers plus their items.
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_estimate_size(item) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in obj.items())
+    return size
+
+
+class CacheBackend:
+    """
+    Interface cache_query expects from a cache. Keys are the hashable
+    tuples built by make_cache_key; tables are lower-cased table names.
+    Subclasses should add themselves to _caches so transactional commits
+    reach them.
+
+    Every invalidate_tables call bumps a write generation for its tables
+    and for "*". cache_query snapshots generations(tables) before running a
+    query and passes it to set, which must refuse to store (and return
+    False) if any of them moved in between, checking atomically with
+    respect to invalidate_tables.
+    """
+
+    def lookup(self, key):
+        """Returns (value, "fresh" | "stale" | "miss")."""
+        raise NotImplementedError
+
+    def generations(self, tables):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None, tables=(), generations=None):
+        raise NotImplementedError
+
+    def invalidate(self, key):
+        raise NotImplementedError
+
+    def invalidate_tables(self, tables):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get(self, key, default=None):
+        value, state = self.lookup(key)
+        return value if state == "fresh" else default
+
+
+class QueryCache(CacheBackend):
+    """
+    In-process LRU cache for query results with optional per-entry TTL and
+    a bound on both the number of entries and their estimated size in bytes.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=None,
+                 stale_ttl=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Expired entries are kept (and served as stale by lookup) this long.
+        self.stale_ttl = stale_ttl
+        self.bytes = 0
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0,
+                      "expirations": 0, "invalidations": 0}
+        self._entries = OrderedDict()  # key -> (value, size, expires_at, tables)
+        self._by_table = {}  # table -> set of keys reading it
+        self._generations = {}  # table -> invalidations so far
+        self._lock = threading.RLock()
+        _caches.add(self)
+
+    def lookup(self, key):
+        """
+        Returns (value, "fresh"), (value, "stale") for an expired entry still
+        inside its stale_ttl window, or (None, "miss").
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None, "miss"
+            value, _, expires_at, _ = entry
+            now = time.monotonic()
+            if expires_at is not None and expires_at <= now:
+                if expires_at + self.stale_ttl > now:
+                    self._entries.move_to_end(key)
+                    self.stats["stale_hits"] += 1
+                    return value, "stale"
+                self._remove(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None, "miss"
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value, "fresh"
+
+    def generations(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in sorted(tables))
+
+    def set(self, key, value, ttl=None, tables=(), generations=None):
+        ttl = self.ttl if ttl is None else ttl
+        size = _estimate_size(value)
+        tables = frozenset(tables)
+        with self._lock:
+            if generations is not None and generations != self.generations(tables):
+                return False
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return True
+            expires_at = time.monotonic() + ttl if ttl is not None else None
+            self._entries[key] = (value, size, expires_at, tables)
+            self.bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats["evictions"] += 1
+        return True
+
+    def _remove(self, key):
+        _, size, _, tables = self._entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tables(self, tables):
+        """
+        Drops every entry that read any of `tables` (or whose tables are
+        unknown). Returns how many entries were removed.
+        """
+        with self._lock:
+            names = {table.lower() for table in tables} | {_ALL_TABLES}
+            for table in names:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            keys = set()
+            for table in names:
+                keys.update(self._by_table.get(table, ()))
+            for key in keys:
+                self._remove(key)
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self.bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.monotonic())
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedSQLiteCache(CacheBackend):
+    """
+    Cache stored in a SQLite file, so every worker process on the host
+    shares one copy. Values are pickled once when stored. Each process keeps
+    the last `memo_entries` decoded results, keyed by entry version, so
+    repeated hits skip unpickling. Eviction is LRU over max_entries and
+    max_bytes (of pickled data), with an entry's last use refreshed at most
+    once per touch_interval seconds. Invalidation, and the write generations
+    that keep a result computed across a write from being stored, live in
+    the file too, so they are visible to all processes.
+    """
+
+    def __init__(self, path="query_cache.db", max_entries=10000,
+                 max_bytes=256 * 1024 * 1024, ttl=None, stale_ttl=0, memo_entries=128,
+                 touch_interval=1.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.memo_entries = memo_entries
+        self.touch_interval = touch_interval
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0,
+                      "expirations": 0, "invalidations": 0, "memo_hits": 0}
+        self._local = threading.local()
+        self._memo = OrderedDict()  # key text -> (version, value)
+        self._memo_lock = threading.Lock()
+        with self._conn() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL,
+                    last_used REAL NOT NULL,
+                    version INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_cache_entries_last_used
+                    ON cache_entries (last_used);
+                CREATE TABLE IF NOT EXISTS cache_tables (
+                    table_name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (table_name, key)
+                );
+                CREATE TABLE IF NOT EXISTS cache_generations (
+                    table_name TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                );
+                """
+            )
+        _caches.add(self)
+
+    def _conn(self):
+        # One connection per thread, and never one inherited across a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _key_text(key):
+        return repr(key)
+
+    def _remember(self, key_text, version, value):
+        with self._memo_lock:
+            self._memo[key_text] = (version, value)
+            self._memo.move_to_end(key_text)
+            while len(self._memo) > self.memo_entries:
+                self._memo.popitem(last=False)
+
+    def lookup(self, key):
+        key_text = self._key_text(key)
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT version, expires_at, last_used FROM cache_entries WHERE key = ?",
+            (key_text,)
+        ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None, "miss"
+
+        version, expires_at, last_used = row
+        now = time.time()
+        state = "fresh"
+        if expires_at is not None and expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                self._expire(conn, key_text, version)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None, "miss"
+            state = "stale"
+
+        # Recording every hit would take the write lock on every read; the
+        # LRU order only needs to be accurate to touch_interval seconds.
+        if now - last_used >= self.touch_interval:
+            conn.execute("UPDATE cache_entries SET last_used = ? WHERE key = ? AND version = ?",
+                         (now, key_text, version))
+        with self._memo_lock:
+            memo = self._memo.get(key_text)
+        if memo is not None and memo[0] == version:
+            self.stats["memo_hits"] += 1
+            value = memo[1]
+        else:
+            row = conn.execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND version = ?",
+                (key_text, version)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None, "miss"
+            value = pickle.loads(row[0])
+            self._remember(key_text, version, value)
+        self.stats["hits" if state == "fresh" else "stale_hits"] += 1
+        return value, state
+
+    @staticmethod
+    def _expire(conn, key_text, version):
+        # Only drop the dependencies of the version we saw expire; another
+        # process may already have stored a fresh one under the same key.
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
+            removed = conn.execute("DELETE FROM cache_entries WHERE key = ? AND version = ?",
+                                   (key_text, version)).rowcount
+            if removed:
+                conn.execute("DELETE FROM cache_tables WHERE key = ?", (key_text,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _generations(conn, tables):
+        tables = sorted(tables)
+        placeholders = ", ".join("?" * len(tables))
+        found = dict(conn.execute(
+            f"SELECT table_name, generation FROM cache_generations "
+            f"WHERE table_name IN ({placeholders})", tables))
+        return tuple(found.get(table, 0) for table in tables)
+
+    def generations(self, tables):
+        return self._generations(self._conn(), tables)
+
+    def set(self, key, value, ttl=None, tables=(), generations=None):
+        ttl = self.ttl if ttl is None else ttl
+        key_text = self._key_text(key)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return True
+        now = time.time()
+        version = random.getrandbits(62)
+        conn = self._conn()
+        # The write lock is held from the check to the insert, so an
+        # invalidation in any process lands either before (and is seen) or
+        # after (and deletes the entry).
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if generations is not None and generations != self._generations(conn, tables):
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(key, value, size, expires_at, last_used, version) VALUES (?, ?, ?, ?, ?, ?)",
+                (key_text, blob, len(blob), now + ttl if ttl is not None else None, now, version)
+            )
+            conn.execute("DELETE FROM cache_tables WHERE key = ?", (key_text,))
+            conn.executemany("INSERT OR IGNORE INTO cache_tables (table_name, key) VALUES (?, ?)",
+                             [(table, key_text) for table in tables])
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._remember(key_text, version, value)
+        return True
+
+    def _evict(self, conn):
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            row = conn.execute(
+                "SELECT key, size FROM cache_entries ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (row[0],))
+            conn.execute("DELETE FROM cache_tables WHERE key = ?", (row[0],))
+            count -= 1
+            total -= row[1]
+            self.stats["evictions"] += 1
+
+    def invalidate(self, key):
+        key_text = self._key_text(key)
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_entries WHERE key = ?", (key_text,))
+        conn.execute("DELETE FROM cache_tables WHERE key = ?", (key_text,))
+
+    def invalidate_tables(self, tables):
+        names = [_ALL_TABLES] + [table.lower() for table in tables]
+        placeholders = ", ".join("?" * len(names))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO cache_generations (table_name, generation) VALUES (?, 1) "
+                "ON CONFLICT (table_name) DO UPDATE SET generation = generation + 1",
+                [(name,) for name in set(names)])
+            keys = [key for (key,) in conn.execute(
+                f"SELECT DISTINCT key FROM cache_tables WHERE table_name IN ({placeholders})",
+                names)]
+            conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(k,) for k in keys])
+            conn.executemany("DELETE FROM cache_tables WHERE key = ?", [(k,) for k in keys])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.stats["invalidations"] += len(keys)
+        return len(keys)
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_entries")
+        conn.execute("DELETE FROM cache_tables")
+        with self._memo_lock:
+            self._memo.clear()
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+
+_caches = weakref.WeakSet()
+
+
+@transactional.register_commit_hook
+def invalidate_tables(tables):
+    """
+    Evicts entries reading any of `tables` from every QueryCache; runs
+    automatically after each transactional commit.
+    """
+    for cache in list(_caches):
+        cache.invalidate_tables(tables)
+
+
+query_cache = QueryCache()
+
+
+class _Flight:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
 
+_flights = {}
+_flights_lock = threading.Lock()
+_async_flights = {}
+_background_tasks = set()
 
-def cache_query(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
+
+def _single_flight(flight_key, compute):
+    # The first caller for a key computes; concurrent callers wait for it.
+    with _flights_lock:
+        flight = _flights.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = _flights[flight_key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = compute()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[flight_key]
+        flight.done.set()
+
+
+async def _single_flight_async(flight_key, compute):
+    # asyncio counterpart of _single_flight, scoped to the running loop. The
+    # query runs in its own task that every caller shields, so cancelling
+    # one caller (say, a request timeout) doesn't cancel the others.
+    flight_key = (id(asyncio.get_running_loop()),) + flight_key
+    flight = _async_flights.get(flight_key)
+    if flight is None:
+        flight = asyncio.ensure_future(compute())
+        _async_flights[flight_key] = flight
+
+        def finished(task):
+            if _async_flights.get(flight_key) is task:
+                del _async_flights[flight_key]
+            if not task.cancelled():
+                task.exception()  # callers re-raise it; don't warn if none are left
+        flight.add_done_callback(finished)
+    return await asyncio.shield(flight)
+
+
+def _connect_users_db_async():
+    import aiosqlite
+    return aiosqlite.connect("users.db")
+
+
+def cache_query(func=None, *, cache=None, max_entries=None, max_bytes=None, ttl=None,
+                stale_while_revalidate=None, connect=None):
+    """
+    Caches results keyed on the normalized SQL plus its bound parameters
+    (the `params` argument, if the function takes one). Each entry records
+    the tables it reads and is evicted when a transactional write to one
+    of them commits; a result whose tables were written while it was being
+    computed is returned but not stored. Use bare (@cache_query) to share the module-level
+    query_cache, or with arguments (@cache_query(max_entries=100, ttl=60))
+    to give the function its own bounded cache, or pass any CacheBackend
+    as cache= (e.g. SharedSQLiteCache() to share one cache between worker
+    processes). The cache in use is exposed as wrapper.cache.
+
+    Concurrent misses for the same key (across threads, or across tasks for
+    coroutine functions) share a single query. With
+    stale_while_revalidate=N, an entry up to N seconds past its ttl is
+    returned immediately while one background refresh runs on a connection
+    from connect(), or for plain functions a pooled users.db connection from
+    connection_provider by default.
+    """
+    if func is None:
+        return functools.partial(cache_query, cache=cache, max_entries=max_entries,
+                                 max_bytes=max_bytes, ttl=ttl,
+                                 stale_while_revalidate=stale_while_revalidate,
+                                 connect=connect)
+
+    if cache is None:
+        if max_entries is None and max_bytes is None and ttl is None \
+                and stale_while_revalidate is None:
+            cache = query_cache
+        else:
+            options = {"ttl": ttl, "stale_ttl": stale_while_revalidate or 0}
+            if max_entries is not None:
+                options["max_entries"] = max_entries
+            if max_bytes is not None:
+                options["max_bytes"] = max_bytes
+            cache = QueryCache(**options)
+
+    is_async = asyncio.iscoroutinefunction(func)
+    if connect is None and is_async:
+        connect = _connect_users_db_async
+
+    def cache_key(args, kwargs):
         query = kwargs.get("query")
         if query is None and len(args) > 1:
             query = args[1]
-        if query in query_cache:
-            print(f"Using cached result for query: {query}")
-            return query_cache[query]
+        params = kwargs.get("params")
+        if params is None and len(args) > 2:
+            params = args[2]
+        return query, make_cache_key(query, params)
 
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        print(f"Caching result for query: {query}")
+    def store(query, key, generations, result):
+        if cache.set(key, result, tables=tables_read(query), generations=generations):
+            print(f"Caching result for query: {query}")
+        else:
+            print(f"Not caching result for query: {query} (tables changed)")
         return result
+
+    if is_async:
+        async def refresh(query, key, args, kwargs):
+            generations = cache.generations(tables_read(query))
+            conn = connect()
+            if inspect.isawaitable(conn):
+                conn = await conn
+            try:
+                return store(query, key, generations, await func(conn, *args[1:], **kwargs))
+            finally:
+                closed = conn.close()
+                if inspect.isawaitable(closed):
+                    await closed
+
+        async def refresh_in_background(query, key, args, kwargs):
+            try:
+                await _single_flight_async(
+                    (id(cache), key), lambda: refresh(query, key, args, kwargs))
+            except Exception as e:
+                print(f"Background refresh failed for query: {query}: {e}")
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            query, key = cache_key(args, kwargs)
+            result, state = cache.lookup(key)
+            if state == "fresh":
+                print(f"Using cached result for query: {query}")
+                return result
+            if state == "stale":
+                print(f"Using stale result for query: {query}")
+                if (id(asyncio.get_running_loop()), id(cache), key) not in _async_flights:
+                    task = asyncio.ensure_future(refresh_in_background(query, key, args, kwargs))
+                    _background_tasks.add(task)
+                    task.add_done_callback(_background_tasks.discard)
+                return result
+
+            async def compute():
+                generations = cache.generations(tables_read(query))
+                return store(query, key, generations, await func(*args, **kwargs))
+            return await _single_flight_async((id(cache), key), compute)
+    else:
+        def refresh(query, key, args, kwargs):
+            generations = cache.generations(tables_read(query))
+            if connect is None:
+                connection = get_provider().connection()
+            else:
+                connection = closing(connect())
+            with connection as conn:
+                return store(query, key, generations, func(conn, *args[1:], **kwargs))
+
+        def refresh_in_background(query, key, args, kwargs):
+            try:
+                _single_flight((id(cache), key), lambda: refresh(query, key, args, kwargs))
+            except Exception as e:
+                print(f"Background refresh failed for query: {query}: {e}")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            query, key = cache_key(args, kwargs)
+            result, state = cache.lookup(key)
+            if state == "fresh":
+                print(f"Using cached result for query: {query}")
+                return result
+            if state == "stale":
+                print(f"Using stale result for query: {query}")
+                if (id(cache), key) not in _flights:
+                    threading.Thread(target=refresh_in_background,
+                                     args=(query, key, args, kwargs), daemon=True).start()
+                return result
+
+            def compute():
+                generations = cache.generations(tables_read(query))
+                return store(query, key, generations, func(*args, **kwargs))
+            return _single_flight((id(cache), key), compute)
+
+    wrapper.cache = cache
     return wrapper
 
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 
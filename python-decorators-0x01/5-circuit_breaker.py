@@ -0,0 +1,244 @@
+#!/usr/bin/python3
+import time
+import asyncio
+import functools
+import threading
+from collections import deque, Counter
+from connection_provider import with_db_connection
+
+retry = __import__('3-retry_on_failure')
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the function while its circuit is open.
+    """
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit {name!r} is open; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through and their outcomes fill a sliding window of
+    `window` seconds. Once it holds at least min_calls and the failure share
+    reaches failure_rate the circuit opens.
+    Open: calls fail fast with CircuitOpenError for open_timeout seconds.
+    Half-open: up to half_open_calls trial calls go through; one success
+    closes the circuit, one failure opens it again. A trial that ends
+    without a verdict (cancelled, interrupted, or an error that isn't a
+    failure) frees its slot, and slots held longer than half_open_timeout
+    (default open_timeout) are given to new callers.
+    Only errors for which is_failure(exc) is true count as failures.
+    Listeners are called as listener(breaker, previous, state) after the
+    breaker's lock is released, so they may use the breaker.
+    """
+
+    def __init__(self, name="default", failure_rate=0.5, min_calls=10,
+                 window=30.0, open_timeout=10.0, half_open_calls=1,
+                 half_open_timeout=None, is_failure=retry.is_transient):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_timeout = open_timeout
+        self.half_open_calls = half_open_calls
+        self.half_open_timeout = open_timeout if half_open_timeout is None else half_open_timeout
+        self.is_failure = is_failure
+        self.state = CLOSED
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0,
+                      "transitions": Counter()}
+        self.transitions = deque(maxlen=100)
+        self.listeners = []
+        self._outcomes = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_started = 0.0
+        self._cycle = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, state, now):
+        # Called with _lock held; returns the transition for _notify().
+        previous, self.state = self.state, state
+        self.stats["transitions"][f"{previous}->{state}"] += 1
+        self.transitions.append((time.time(), previous, state))
+        self._outcomes.clear()
+        self._failures = 0
+        self._trials = 0
+        self._cycle += 1
+        if state == OPEN:
+            self._opened_at = now
+        return previous, state
+
+    def _notify(self, transition):
+        if transition is None:
+            return
+        for listener in list(self.listeners):
+            try:
+                listener(self, *transition)
+            except Exception as e:
+                print(f"Circuit listener {listener!r} failed: {e}")
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError if the call must not go through. Returns a
+        token identifying a half-open trial (None otherwise) to hand to
+        abandon() if the call ends without a verdict.
+        """
+        now = time.monotonic()
+        transition = None
+        try:
+            with self._lock:
+                if self.state == OPEN:
+                    remaining = self._opened_at + self.open_timeout - now
+                    if remaining > 0:
+                        self.stats["rejected"] += 1
+                        raise CircuitOpenError(self.name, remaining)
+                    transition = self._transition(HALF_OPEN, now)
+                token = None
+                if self.state == HALF_OPEN:
+                    if self._trials >= self.half_open_calls:
+                        if now - self._trial_started < self.half_open_timeout:
+                            self.stats["rejected"] += 1
+                            raise CircuitOpenError(self.name, 0.0)
+                        # The trials in flight never reported back.
+                        self._trials = 0
+                    self._trials += 1
+                    self._trial_started = now
+                    token = self._cycle
+                self.stats["calls"] += 1
+                return token
+        finally:
+            self._notify(transition)
+
+    def abandon(self, token):
+        """
+        Frees the half-open trial slot taken by before_call() without
+        counting a success or a failure.
+        """
+        with self._lock:
+            if token is not None and token == self._cycle and self._trials:
+                self._trials -= 1
+
+    def record(self, failed):
+        now = time.monotonic()
+        transition = None
+        with self._lock:
+            self.stats["failures"] += failed
+            if self.state == HALF_OPEN:
+                transition = self._transition(OPEN if failed else CLOSED, now)
+            elif self.state == CLOSED:
+                self._outcomes.append((now, failed))
+                self._failures += failed
+                horizon = now - self.window
+                while self._outcomes and self._outcomes[0][0] < horizon:
+                    self._failures -= self._outcomes.popleft()[1]
+                calls = len(self._outcomes)
+                if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+                    transition = self._transition(OPEN, now)
+        self._notify(transition)
+
+    def record_exception(self, exc, token=None):
+        # Errors that say nothing about the database's health (bad SQL, a
+        # missing row) release a half-open trial without a verdict.
+        if self.is_failure(exc):
+            self.record(True)
+        elif token is not None:
+            self.abandon(token)
+        else:
+            self.record(False)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name="users.db", **options):
+    """
+    Returns the process-wide CircuitBreaker called name, creating it with
+    options on first use.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **options)
+        return breaker
+
+
+def circuit_breaker(func=None, *, name="users.db", breaker=None,
+                    none_is_failure=False, **options):
+    """
+    Guards func with a circuit breaker (the shared one called name unless
+    breaker is given). Put it outermost, above with_db_connection and
+    retry_on_failure, so an open circuit skips both the connection and the
+    retry delays; CircuitOpenError is not transient so it is never retried.
+    With none_is_failure a None result also counts as a failure, for
+    functions such as seed.connect_to_prodev that report errors that way:
+
+        connect = circuit_breaker(seed.connect_to_prodev, name="ALX_prodev",
+                                  none_is_failure=True)
+    """
+    if func is None:
+        return functools.partial(circuit_breaker, name=name, breaker=breaker,
+                                 none_is_failure=none_is_failure, **options)
+    if breaker is None:
+        breaker = get_breaker(name, **options)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token = breaker.before_call()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                breaker.record_exception(e, token)
+                raise
+            except BaseException:
+                # Cancelled (e.g. by asyncio.wait_for): no verdict either way.
+                breaker.abandon(token)
+                raise
+            breaker.record(none_is_failure and result is None)
+            return result
+        async_wrapper.breaker = breaker
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = breaker.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            breaker.record_exception(e, token)
+            raise
+        except BaseException:
+            breaker.abandon(token)
+            raise
+        breaker.record(none_is_failure and result is None)
+        return result
+    wrapper.breaker = breaker
+    return wrapper
+
+
+@circuit_breaker
+@with_db_connection
+@retry.retry_on_failure(retries=3, delay=1)
+def fetch_users_with_breaker(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users")
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    try:
+        users = fetch_users_with_breaker()
+        print(users)
+    except CircuitOpenError as e:
+        print(e)
+    print(fetch_users_with_breaker.breaker.stats)
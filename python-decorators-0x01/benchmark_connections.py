@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""
+Compares calls/sec of a one-row lookup through the original
+connect-per-call with_db_connection and the pooled one from
+connection_provider, single-threaded and with several threads.
+
+    python3 benchmark_connections.py --calls 20000 --threads 8
+"""
+import argparse
+import sqlite3
+import functools
+import threading
+import time
+from connection_provider import with_db_connection
+
+
+def with_fresh_connection(func):
+    # The decorator as it was before connection_provider.
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = sqlite3.connect("users.db")
+        try:
+            result = func(conn, *args, **kwargs)
+        finally:
+            conn.close()
+        return result
+    return wrapper
+
+
+def get_user_by_id(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
+
+
+VARIANTS = {
+    "connect per call": with_fresh_connection(get_user_by_id),
+    "pooled": with_db_connection(get_user_by_id),
+}
+
+
+def calls_per_sec(fetch, calls, threads):
+    per_thread = calls // threads
+
+    def run():
+        for i in range(per_thread):
+            fetch(i % 100 + 1)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark with_db_connection.")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    for threads in sorted({1, args.threads}):
+        for name, fetch in VARIANTS.items():
+            rate = calls_per_sec(fetch, args.calls, threads)
+            print(f"{name:<18} {threads:>2} thread(s): {rate:>10.0f} calls/sec")
@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+import sqlite3
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Applied to every new connection. WAL lets readers run alongside a writer;
+# negative cache_size is in KiB.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64 * 1024,
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,
+}
+
+
+class ConnectionProvider:
+    """
+    Thread-safe pool of sqlite3 connections to one database file.
+    Each thread first reuses the connection it released last; otherwise it
+    takes an idle one from the shared pool or opens a new one. At most
+    max_size connections are checked out at once.
+
+    On release a connection is rolled back and its row_factory,
+    text_factory, isolation_level, authorizer, progress handler and trace
+    callback are reset. Functions, aggregates and collations cannot be
+    unregistered generically: release a connection you registered any on
+    with discard=True (or connection(discard=True)) so it is closed rather
+    than handed to the next borrower.
+    """
+
+    def __init__(self, db_path="users.db", max_size=16, max_idle=8, pragmas=None):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self.stats = {"opened": 0, "thread_reuse": 0, "pool_reuse": 0, "closed": 0}
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self.stats["opened"] += 1
+        return conn
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            conn = getattr(self._local, "conn", None)
+            if conn is not None:
+                self._local.conn = None
+                with self._lock:
+                    self.stats["thread_reuse"] += 1
+                return conn
+            with self._lock:
+                if self._idle:
+                    self.stats["pool_reuse"] += 1
+                    return self._idle.pop()
+            return self._open()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    @staticmethod
+    def _reset(conn):
+        if conn.in_transaction:
+            # Same outcome as closing it: uncommitted work is discarded.
+            conn.rollback()
+        conn.row_factory = None
+        conn.text_factory = str
+        conn.isolation_level = ""
+        conn.set_authorizer(None)
+        conn.set_progress_handler(None, 0)
+        conn.set_trace_callback(None)
+
+    def release(self, conn, discard=False):
+        try:
+            if discard:
+                conn.close()
+                with self._lock:
+                    self.stats["closed"] += 1
+                return
+            self._reset(conn)
+            if getattr(self._local, "conn", None) is None:
+                self._local.conn = conn
+                return
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(conn)
+                    return
+                self.stats["closed"] += 1
+            conn.close()
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, discard=False):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn, discard)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(db_path="users.db"):
+    """
+    Returns the process-wide ConnectionProvider for db_path.
+    """
+    with _providers_lock:
+        provider = _providers.get(db_path)
+        if provider is None:
+            provider = _providers[db_path] = ConnectionProvider(db_path)
+        return provider
+
+
+def with_db_connection(func=None, *, db_path="users.db"):
+    """
+    Passes a pooled connection to func as its first argument and returns
+    it to the pool afterwards.
+    """
+    if func is None:
+        return functools.partial(with_db_connection, db_path=db_path)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with get_provider(db_path).connection() as conn:
+            return func(conn, *args, **kwargs)
+    return wrapper
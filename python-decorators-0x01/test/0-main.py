@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+os.chdir(tempfile.mkdtemp())
+conn = sqlite3.connect("users.db")
+conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+conn.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                 [(f"user{i}", f"user{i}@example.com") for i in range(100)])
+conn.commit()
+
+log_queries = __import__('0-log_queries')
+
+assert log_queries.query_shape("SELECT * FROM users WHERE id IN (1, 2, 3) AND name = 'x'") == \
+    "SELECT * FROM users WHERE id IN (?) AND name = ?"
+print("query_shape: OK")
+
+events = []
+log_queries.register_hook(events.append)
+
+
+@log_queries.log_queries
+def fetch(conn, query, params=()):
+    return conn.execute(query, params).fetchall()
+
+
+for i in range(1, 6):
+    fetch(conn, f"SELECT * FROM users WHERE id = {i}")
+try:
+    fetch(conn, "SELECT * FROM missing")
+except sqlite3.OperationalError:
+    pass
+stats = log_queries.query_stats()
+assert stats["SELECT * FROM users WHERE id = ?"]["count"] == 5
+assert stats["SELECT * FROM users WHERE id = ?"]["rows"] == 5
+assert stats["SELECT * FROM missing"]["errors"] == 1
+assert len(events) == 6 and events[0]["function"] == "fetch"
+print("query_stats: OK")
+
+log_queries.reset_stats()
+log_queries.config["sample_rate"] = 0.0
+fetch(conn, "SELECT * FROM users")
+assert log_queries.query_stats() == {}
+print("sampling: OK")
+
+# Slow calls are captured with their plan even when not sampled.
+log_queries.config["slow_threshold"] = 0.0
+fetch(conn, "SELECT * FROM users WHERE email = ?", ("user1@example.com",))
+fetch(conn, "SELECT * FROM users WHERE id = ?", (1,))
+slow = log_queries.slow_queries()
+assert [entry["full_table_scans"] for entry in slow] == [["users"], []]
+assert log_queries.query_stats() == {}
+assert '"plan"' in log_queries.dump_slow_queries()
+print("slow query log: OK")
+
+# A stalled flush thread drops new events instead of blocking callers, and
+# the read APIs give up waiting after flush_timeout.
+log_queries.config.update(sample_rate=1.0, slow_threshold=None, flush_timeout=0.1)
+log_queries.reset_stats()
+release = threading.Event()
+
+
+def stall(event):
+    if event["query"] == "SELECT 'stall'":
+        release.wait()
+
+
+log_queries.register_hook(stall)
+fetch(conn, "SELECT 'stall'")
+time.sleep(0.05)
+for _ in range(log_queries.QUEUE_SIZE + 5):
+    fetch(conn, "SELECT 1 FROM users LIMIT 1")
+assert log_queries.dropped_events() == 5
+started = time.monotonic()
+assert not log_queries.flush(timeout=0.1)
+assert "SELECT ? FROM users LIMIT ?" not in log_queries.query_stats()
+assert time.monotonic() - started < 1
+release.set()
+assert log_queries.flush(timeout=5)
+assert log_queries.query_stats()["SELECT ? FROM users LIMIT ?"]["count"] == log_queries.QUEUE_SIZE
+print("bounded event queue: OK")
+
+# Plans are taken on the database the call used, aliases resolve to their
+# tables, and constant rows / subquery scans are not reported as tables.
+other = sqlite3.connect("orders.db")
+other.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER, total REAL)")
+other.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+log_queries.config.update(slow_threshold=0.0, flush_timeout=5.0)
+log_queries.reset_stats()
+fetch(other, "SELECT * FROM orders o JOIN users AS u ON u.id = o.user_id")
+fetch(other, "SELECT 1")
+fetch(other, "SELECT * FROM (SELECT user_id, SUM(total) FROM orders GROUP BY user_id) totals")
+fetch(other, "WITH t AS MATERIALIZED (SELECT user_id, SUM(total) FROM orders GROUP BY user_id)"
+             " SELECT * FROM t JOIN users ON users.id = t.user_id")
+assert [entry["full_table_scans"] for entry in log_queries.slow_queries()] == \
+    [["orders"], [], ["orders"], ["orders"]]
+
+
+@log_queries.log_queries(db_path="orders.db")
+def fetch_orders(query):
+    with sqlite3.connect("orders.db") as conn:
+        return conn.execute(query).fetchall()
+
+
+log_queries.reset_stats()
+fetch_orders("SELECT * FROM orders")
+assert log_queries.slow_queries()[0]["full_table_scans"] == ["orders"]
+print("slow query plans: OK")
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+import os
+import sqlite3
+import tempfile
+import threading
+
+os.chdir(tempfile.mkdtemp())
+conn = sqlite3.connect("users.db")
+conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+conn.execute("INSERT INTO users VALUES (1, 'Alice')")
+conn.commit()
+conn.close()
+
+import connection_provider
+
+provider = connection_provider.ConnectionProvider("users.db", max_size=2, max_idle=1)
+with provider.connection() as first:
+    assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    first.execute("INSERT INTO users VALUES (2, 'Bob')")
+with provider.connection() as second:
+    assert second is first
+    # Uncommitted work is rolled back when a connection is released.
+    assert second.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 1
+assert provider.stats["opened"] == 1 and provider.stats["thread_reuse"] == 1
+print("ConnectionProvider reuse: OK")
+
+# Per-connection settings don't leak to the next borrower.
+with provider.connection() as conn:
+    conn.row_factory = sqlite3.Row
+    conn.text_factory = bytes
+    conn.isolation_level = None
+    conn.set_authorizer(lambda *args: sqlite3.SQLITE_DENY)
+with provider.connection() as conn:
+    assert conn is first
+    assert conn.execute("SELECT name FROM users").fetchone() == ("Alice",)
+    assert conn.isolation_level == ""
+with provider.connection(discard=True) as conn:
+    conn.create_function("shout", 1, str.upper)
+with provider.connection() as conn:
+    assert conn is not first
+    try:
+        conn.execute("SELECT shout(name) FROM users")
+        raise AssertionError("function leaked to the next borrower")
+    except sqlite3.OperationalError:
+        pass
+assert provider.stats["opened"] == 2 and provider.stats["closed"] == 1
+print("ConnectionProvider reset: OK")
+
+checked_out = []
+peak = []
+lock = threading.Lock()
+barrier = threading.Barrier(4)
+
+
+def borrow():
+    barrier.wait()
+    with provider.connection() as conn:
+        with lock:
+            checked_out.append(conn)
+            peak.append(len(checked_out))
+        conn.execute("SELECT * FROM users").fetchall()
+        with lock:
+            checked_out.remove(conn)
+
+
+threads = [threading.Thread(target=borrow) for _ in range(4)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+assert max(peak) <= 2
+print("ConnectionProvider max_size: OK")
+
+with_db_connection = __import__('1-with_db_connection')
+assert with_db_connection.get_user_by_id(user_id=1) == (1, "Alice")
+assert connection_provider.get_provider("users.db") is connection_provider.get_provider()
+print("with_db_connection: OK")
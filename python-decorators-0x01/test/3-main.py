@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+import asyncio
+import sqlite3
+
+retry = __import__('3-retry_on_failure')
+
+assert retry.is_transient(sqlite3.OperationalError("database is locked"))
+assert retry.is_transient(TimeoutError())
+assert not retry.is_transient(sqlite3.OperationalError("near \"SELEC\": syntax error"))
+assert not retry.is_transient(ValueError())
+print("is_transient: OK")
+
+for attempt in range(1, 6):
+    assert 0 <= retry.backoff(attempt, 1, 4) <= min(4, 2 ** (attempt - 1))
+assert retry.backoff(10, 1, 4, jitter=False) == 4
+print("backoff: OK")
+
+attempts = []
+
+
+@retry.retry_on_failure(retries=4, delay=0.001, budget=None)
+def locked_twice():
+    attempts.append(1)
+    if len(attempts) < 3:
+        raise sqlite3.OperationalError("database is locked")
+    return "ok"
+
+
+assert locked_twice() == "ok" and len(attempts) == 3
+
+attempts.clear()
+
+
+@retry.retry_on_failure(retries=4, delay=0.001, budget=None)
+def bad_sql():
+    attempts.append(1)
+    raise sqlite3.OperationalError("no such table: nope")
+
+
+try:
+    bad_sql()
+except sqlite3.OperationalError:
+    pass
+assert len(attempts) == 1
+print("retry_on_failure: OK")
+
+budget = retry.RetryBudget(ratio=0, min_retries=2)
+
+
+@retry.retry_on_failure(retries=10, delay=0.001, budget=budget)
+def outage():
+    raise ConnectionError("down")
+
+
+for _ in range(3):
+    try:
+        outage()
+    except ConnectionError:
+        pass
+assert budget.stats["retries"] == 2
+assert budget.stats["exhausted"] == 3
+print("RetryBudget: OK")
+
+attempts.clear()
+
+
+@retry.retry_on_failure(retries=3, delay=0.001, budget=None)
+async def async_outage():
+    attempts.append(1)
+    raise TimeoutError()
+
+
+try:
+    asyncio.run(async_outage())
+except TimeoutError:
+    pass
+assert len(attempts) == 3
+print("async retry_on_failure: OK")
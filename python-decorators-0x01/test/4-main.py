@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+import os
+import time
+import asyncio
+import sqlite3
+import tempfile
+import threading
+
+os.chdir(tempfile.mkdtemp())
+conn = sqlite3.connect("users.db")
+conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+conn.execute("INSERT INTO users VALUES (1, 'Alice', 'old@example.com')")
+conn.commit()
+conn.close()
+
+cache_query = __import__('4-cache_query')
+transactional = __import__('2-transactional')
+from connection_provider import with_db_connection
+
+# QueryCache: LRU bound and TTL
+cache = cache_query.QueryCache(max_entries=2, ttl=0.05)
+cache.set("a", [1])
+cache.set("b", [2])
+cache.lookup("a")
+cache.set("c", [3])
+assert cache.lookup("b") == (None, "miss")
+assert cache.lookup("a") == ([1], "fresh")
+assert cache.stats["evictions"] == 1
+time.sleep(0.06)
+assert cache.lookup("a") == (None, "miss")
+big = cache_query.QueryCache(max_bytes=1000)
+big.set("rows", list(range(1000)))
+assert len(big) == 0
+print("QueryCache: OK")
+
+# Keys, table extraction and per-table invalidation
+assert cache_query.make_cache_key("SELECT *  FROM users;", [1]) == \
+    cache_query.make_cache_key("SELECT * FROM users", (1,))
+assert cache_query.tables_read("SELECT * FROM users u JOIN orders o ON u.id = o.uid") == \
+    {"users", "orders"}
+assert cache_query.tables_read("SELECT 1") == {"*"}
+cache = cache_query.QueryCache()
+cache.set("a", [1], tables={"users"})
+cache.set("b", [2], tables={"orders"})
+cache.set("c", [3], tables={"*"})
+assert cache.invalidate_tables({"USERS"}) == 2
+assert cache.lookup("b") == ([2], "fresh")
+print("cache keys and invalidation: OK")
+
+# A read racing a committed write must not be cached
+query = "SELECT email FROM users WHERE id = 1"
+
+
+@with_db_connection
+@cache_query.cache_query(max_entries=10)
+def slow_fetch(conn, query, params=()):
+    rows = conn.execute(query, params).fetchall()
+    time.sleep(0.2)
+    return rows
+
+
+reader = threading.Thread(target=slow_fetch, args=(query,))
+reader.start()
+time.sleep(0.05)
+transactional.update_user_email(user_id=1, new_email="new@example.com")
+reader.join()
+assert slow_fetch(query) == [("new@example.com",)]
+assert slow_fetch.cache.lookup(cache_query.make_cache_key(query))[1] == "fresh"
+print("write during read: OK")
+
+# Stale entries are served while inside stale_ttl
+cache = cache_query.QueryCache(ttl=0.05, stale_ttl=0.05)
+cache.set("d", [4])
+time.sleep(0.06)
+assert cache.lookup("d") == ([4], "stale")
+time.sleep(0.05)
+assert cache.lookup("d") == (None, "miss")
+print("stale entries: OK")
+
+# Single flight: concurrent misses share one call
+calls = []
+
+
+@cache_query.cache_query(max_entries=10)
+def counted(conn, query):
+    calls.append(query)
+    time.sleep(0.1)
+    return [len(calls)]
+
+
+threads = [threading.Thread(target=counted, args=(None, "SELECT * FROM users"))
+           for _ in range(5)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+assert len(calls) == 1
+print("single flight: OK")
+
+
+# Cancelling the leader must not cancel the followers
+async def cancel_leader():
+    async def compute():
+        await asyncio.sleep(0.1)
+        return 42
+
+    leader = asyncio.create_task(cache_query._single_flight_async(("key",), compute))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.create_task(cache_query._single_flight_async(("key",), compute))
+                 for _ in range(2)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    results = await asyncio.gather(leader, *followers, return_exceptions=True)
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1:] == [42, 42]
+    assert not cache_query._async_flights
+
+asyncio.run(cancel_leader())
+print("async single flight: OK")
+
+# SharedSQLiteCache: shared between instances, versioned expiry
+first = cache_query.SharedSQLiteCache("shared.db", ttl=0.05)
+second = cache_query.SharedSQLiteCache("shared.db", ttl=60)
+first.set(("k",), [1], tables={"users"})
+assert second.lookup(("k",)) == ([1], "fresh")
+time.sleep(0.06)
+expire = first._expire
+
+
+def store_then_expire(conn, key_text, version):
+    second.set(("k",), [2], tables={"users"})
+    expire(conn, key_text, version)
+
+
+first._expire = store_then_expire
+assert first.lookup(("k",)) == (None, "miss")
+assert second.invalidate_tables({"users"}) == 1
+assert second.lookup(("k",)) == (None, "miss")
+print("SharedSQLiteCache: OK")
+
+# Write generations live in the shared file: a result computed in one
+# process across another process's invalidation is not stored.
+snapshot = first.generations({"users"})
+second.invalidate_tables({"users"})
+assert first.set(("k",), [3], tables={"users"}, generations=snapshot) is False
+assert second.lookup(("k",)) == (None, "miss")
+snapshot = first.generations({"users"})
+assert first.set(("k",), [3], tables={"users"}, generations=snapshot) is True
+assert second.lookup(("k",)) == ([3], "fresh")
+print("SharedSQLiteCache generations: OK")
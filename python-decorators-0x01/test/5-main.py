@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+import time
+import asyncio
+import sqlite3
+
+breakers = __import__('5-circuit_breaker')
+
+breaker = breakers.CircuitBreaker("test", min_calls=4, failure_rate=0.5,
+                                  open_timeout=0.05)
+seen = []
+
+
+def listener(b, previous, state):
+    # Listeners run outside the breaker's lock, so they may call into it.
+    assert b._lock.acquire(blocking=False)
+    b._lock.release()
+    seen.append((previous, state))
+
+
+breaker.listeners.append(listener)
+healthy = [False]
+
+
+@breakers.circuit_breaker(breaker=breaker)
+def query():
+    if not healthy[0]:
+        raise sqlite3.OperationalError("database is locked")
+    return "ok"
+
+
+for _ in range(4):
+    try:
+        query()
+    except sqlite3.OperationalError:
+        pass
+assert breaker.state == breakers.OPEN
+try:
+    query()
+    raise AssertionError("expected CircuitOpenError")
+except breakers.CircuitOpenError:
+    pass
+print("opens on failures: OK")
+
+time.sleep(0.06)
+healthy[0] = True
+assert query() == "ok"
+assert breaker.state == breakers.CLOSED
+assert seen == [("closed", "open"), ("open", "half_open"), ("half_open", "closed")]
+assert breaker.stats["rejected"] == 1
+print("half-open recovery: OK")
+
+
+@breakers.circuit_breaker(breaker=breaker)
+def bad_sql():
+    raise sqlite3.OperationalError("no such table: nope")
+
+
+for _ in range(5):
+    try:
+        bad_sql()
+    except sqlite3.OperationalError:
+        pass
+assert breaker.state == breakers.CLOSED
+print("ignores bad SQL: OK")
+
+
+class OperationalError(Exception):
+    pass
+
+
+OperationalError.__module__ = "MySQLdb._exceptions"
+mysql = breakers.CircuitBreaker("mysql", min_calls=1)
+assert mysql.is_failure(OperationalError(2003, "Can't connect to MySQL server"))
+assert not mysql.is_failure(OperationalError(1054, "Unknown column 'x'"))
+
+
+@breakers.circuit_breaker(breaker=mysql, none_is_failure=True)
+def connect_to_prodev():
+    return None
+
+
+connect_to_prodev()
+assert mysql.state == breakers.OPEN
+print("MySQL failures: OK")
+
+
+async def cancelled_trial():
+    timeouts = breakers.CircuitBreaker("timeouts", min_calls=1, open_timeout=0.05,
+                                       half_open_timeout=10)
+
+    @breakers.circuit_breaker(breaker=timeouts)
+    async def slow_query(delay):
+        await asyncio.sleep(delay)
+        return "ok"
+
+    timeouts.record(True)
+    assert timeouts.state == breakers.OPEN
+    await asyncio.sleep(0.06)
+    try:
+        await asyncio.wait_for(slow_query(1), 0.01)
+    except asyncio.TimeoutError:
+        pass
+    # The cancelled trial gave its slot back, so the next call is admitted.
+    assert await slow_query(0) == "ok"
+    assert timeouts.state == breakers.CLOSED
+
+asyncio.run(cancelled_trial())
+print("cancelled half-open trial: OK")
+
+lost = breakers.CircuitBreaker("lost", min_calls=1, open_timeout=0.01,
+                               half_open_timeout=0.05)
+lost.record(True)
+time.sleep(0.02)
+lost.before_call()  # a trial that never reports back
+try:
+    lost.before_call()
+    raise AssertionError("expected CircuitOpenError")
+except breakers.CircuitOpenError:
+    pass
+time.sleep(0.06)
+lost.before_call()
+lost.record(False)
+assert lost.state == breakers.CLOSED
+print("half-open deadline: OK")
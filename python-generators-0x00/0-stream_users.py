@@ -1,20 +1,50 @@
 import MySQLdb
-from MySQLdb.cursors import DictCursor
-import seed  
+from MySQLdb.cursors import Cursor, DictCursor, SSCursor, SSDictCursor
+import seed
+
+def stream_users(server_side=False, chunk_size=1000, columns=None, where=None,
+                 records=False):
+    """
+    Yields user_data rows one at a time as dicts.
+    With server_side=True the rows are read through an unbuffered
+    SSDictCursor in fetchmany(chunk_size) chunks, so memory is bounded by
+    the chunk instead of the whole table.
+    columns and where (see seed.compile_filter) are pushed into the query.
+    records=True yields compact namedtuple records (seed.record_type)
+    instead of dicts.
+    """
+    select_sql, _ = seed.compile_projection(columns)
+    filter_sql, filter_params = seed.compile_filter(where)
+    where_sql = f" WHERE {filter_sql}" if filter_sql else ""
 
-def stream_users():
- 
     connection = None
     cursor = None
     try:
-        connection = seed.connect_to_prodev()
+        connection = seed.get_connection()
         if not connection:
             return
 
-        cursor = connection.cursor(DictCursor)
-        cursor.execute("SELECT * FROM user_data ORDER BY name;")
+        if records:
+            cursor = connection.cursor(SSCursor if server_side else Cursor)
+        else:
+            cursor = connection.cursor(SSDictCursor if server_side else DictCursor)
+        cursor.execute(f"SELECT {select_sql} FROM user_data{where_sql} ORDER BY name;",
+                       filter_params)
+
+        if server_side:
+            def chunked():
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+            rows = chunked()
+        else:
+            rows = cursor
+        if records:
+            rows = map(seed.record_maker([desc[0] for desc in cursor.description]), rows)
 
-        for row in cursor:
+        for row in rows:
             yield row
 
     except Exception as e:
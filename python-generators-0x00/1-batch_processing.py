@@ -1,35 +1,168 @@
-import seed  
+import base64
+import json
+import seed
 
-def stream_users_in_batches(batch_size):
-  
-    connection = seed.connect_to_prodev()
+
+def encode_cursor_token(name, user_id):
+    """
+    Packs the last (name, user_id) seen into an opaque resume token.
+    """
+    raw = json.dumps([name, user_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor_token(token):
+    """
+    Reverses encode_cursor_token, returning (name, user_id).
+    Raises ValueError for a malformed or tampered token.
+    """
+    try:
+        name, user_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor token: {token!r}") from e
+    if not isinstance(name, str) or not isinstance(user_id, str):
+        raise ValueError(f"Invalid cursor token: {token!r}")
+    return name, user_id
+
+
+def _keyset_pages(batch_size, cursor_token=None, columns=None, where=None):
+    # Yields (col_names, rows, last_key) per page, seeking past last_key.
+    # Rows may carry trailing paging-key columns beyond col_names.
+    select_sql, n_output = seed.compile_projection(columns, ("name", "user_id"))
+    filter_sql, filter_params = seed.compile_filter(where)
+    # Validate the token before borrowing, so a bad one can't hold a slot.
+    last_key = decode_cursor_token(cursor_token) if cursor_token else None
+
+    connection = seed.get_connection()
     if not connection:
         return
 
-    cursor = connection.cursor()  
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        while True:
+            conditions = [f"({filter_sql})"] if filter_sql else []
+            params = list(filter_params)
+            if last_key is not None:
+                name, user_id = last_key
+                conditions.append("(name > %s OR (name = %s AND user_id > %s))")
+                params.extend((name, name, user_id))
+            where_sql = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+            cursor.execute(
+                f"SELECT {select_sql} FROM user_data {where_sql}"
+                "ORDER BY name, user_id LIMIT %s",
+                params + [batch_size]
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            col_names = [desc[0] for desc in cursor.description]
+            last_row = rows[-1]
+            last_key = (last_row[col_names.index("name")],
+                        last_row[col_names.index("user_id")])
+            yield col_names[:n_output], rows, last_key
+
+            if len(rows) < batch_size:
+                break
+    finally:
+        if cursor:
+            cursor.close()
+        connection.close()
+
+
+def _offset_pages(batch_size, columns=None, where=None):
+    # Yields (col_names, rows) per LIMIT/OFFSET page.
+    select_sql, _ = seed.compile_projection(columns or ["user_id", "name", "email", "age"])
+    filter_sql, filter_params = seed.compile_filter(where)
+    where_sql = f"WHERE {filter_sql} " if filter_sql else ""
+
+    connection = seed.get_connection()
+    if not connection:
+        return
+
+    cursor = None
     offset = 0
 
-    while True:
-        cursor.execute(
-            "SELECT user_id, name, email, age FROM user_data ORDER BY name LIMIT %s OFFSET %s",
-            (batch_size, offset)
-        )
-        rows = cursor.fetchall()
-        if not rows:
-            break
-
-       
-        col_names = [desc[0] for desc in cursor.description]
-        for row in rows:
-            yield dict(zip(col_names, row))  
-        offset += batch_size
-
-    cursor.close()
-    connection.close()
-
-
-def batch_processing(batch_size):
-  
-    for user in stream_users_in_batches(batch_size):  
-        if user['age'] > 25:
-            print(user)  
+    try:
+        cursor = connection.cursor()
+        while True:
+            cursor.execute(
+                f"SELECT {select_sql} FROM user_data {where_sql}ORDER BY name LIMIT %s OFFSET %s",
+                filter_params + [batch_size, offset]
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            col_names = [desc[0] for desc in cursor.description]
+            yield col_names, rows
+            offset += batch_size
+    finally:
+        if cursor:
+            cursor.close()
+        connection.close()
+
+
+def stream_user_batches_keyset(batch_size, cursor_token=None, columns=None, where=None,
+                               records=False):
+    """
+    Seeks past the last (name, user_id) instead of using OFFSET, so every
+    batch costs the same no matter how deep the scan is.
+    Yields (batch, next_cursor_token) pairs; pass the token back in to resume.
+    """
+    for col_names, rows, last_key in _keyset_pages(batch_size, cursor_token, columns, where):
+        if records:
+            batch = list(map(seed.record_maker(col_names), rows))
+        else:
+            batch = [dict(zip(col_names, row)) for row in rows]
+        yield batch, encode_cursor_token(*last_key)
+
+
+def _pages(batch_size, keyset, cursor_token, columns, where):
+    if keyset:
+        return ((cols, rows) for cols, rows, _ in
+                _keyset_pages(batch_size, cursor_token, columns, where))
+    return _offset_pages(batch_size, columns, where)
+
+
+def stream_user_column_batches(batch_size, keyset=True, cursor_token=None,
+                               columns=None, where=None):
+    """
+    Columnar counterpart of stream_users_in_batches: yields one
+    {column: numpy array} dict per batch instead of a dict per row.
+    """
+    for col_names, rows in _pages(batch_size, keyset, cursor_token, columns, where):
+        yield seed.rows_to_columns(col_names, rows)
+
+
+def stream_users_in_batches(batch_size, keyset=False, cursor_token=None,
+                            columns=None, where=None, records=False):
+    """
+    Yields users one at a time, reading them batch_size rows per query.
+    columns limits the SELECT list and where (see seed.compile_filter) is
+    applied by the database, so filtered-out rows never cross the wire.
+    records=True yields namedtuple records instead of dicts.
+    """
+    pages = _pages(batch_size, keyset, cursor_token, columns, where)
+
+    for col_names, rows in pages:
+        if records:
+            yield from map(seed.record_maker(col_names), rows)
+        else:
+            for row in rows:
+                yield dict(zip(col_names, row))
+
+
+def batch_processing(batch_size, keyset=False, columnar=False):
+
+    if columnar:
+        for columns in stream_user_column_batches(batch_size, keyset=keyset,
+                                                  where=[("age", ">", 25)]):
+            for values in zip(*(column.tolist() for column in columns.values())):
+                print(dict(zip(columns, values)))
+        return
+
+    for user in stream_users_in_batches(batch_size, keyset=keyset,
+                                        where=[("age", ">", 25)]):
+        print(user)
@@ -1,19 +1,32 @@
+import queue
+import threading
 import seed
 
-def paginate_users(page_size: int, offset: int) -> list:
+def _page_query(columns, where):
+    select_sql, _ = seed.compile_projection(columns)
+    filter_sql, filter_params = seed.compile_filter(where)
+    where_sql = f" WHERE {filter_sql}" if filter_sql else ""
+    return f"SELECT {select_sql} FROM user_data{where_sql} LIMIT %s OFFSET %s", filter_params
+
+
+def paginate_users(page_size: int, offset: int, columns=None, where=None,
+                   records: bool = False) -> list:
 
     connection = None
     try:
-        connection = seed.connect_to_prodev()
+        connection = seed.get_connection()
         if connection:
             cursor = connection.cursor()
-            query = f"SELECT * FROM user_data LIMIT %s OFFSET %s"
-            cursor.execute(query, (page_size, offset))
+            query, params = _page_query(columns, where)
+            cursor.execute(query, params + [page_size, offset])
             rows = cursor.fetchall()
             col_names = [desc[0] for desc in cursor.description]
-            dict_rows = [dict(zip(col_names, row)) for row in rows]
+            if records:
+                page = list(map(seed.record_maker(col_names), rows))
+            else:
+                page = [dict(zip(col_names, row)) for row in rows]
             cursor.close()
-            return dict_rows
+            return page
         return []
     except Exception as e:
         print(f"Error in paginate_users: {e}")
@@ -23,11 +36,98 @@ def paginate_users(page_size: int, offset: int) -> list:
             connection.close()
 
 
-def lazy_pagination(page_size: int = 100):
-  
+def paginate_user_columns(page_size: int, offset: int, columns=None, where=None) -> dict:
+    """
+    Same page as paginate_users, returned as {column: numpy array}.
+    """
+    connection = None
+    try:
+        connection = seed.get_connection()
+        if connection:
+            cursor = connection.cursor()
+            query, params = _page_query(columns, where)
+            cursor.execute(query, params + [page_size, offset])
+            rows = cursor.fetchall()
+            col_names = [desc[0] for desc in cursor.description]
+            cursor.close()
+            return seed.rows_to_columns(col_names, rows) if rows else {}
+        return {}
+    except Exception as e:
+        print(f"Error in paginate_user_columns: {e}")
+        return {}
+    finally:
+        if connection:
+            connection.close()
+
+
+def _prefetch_pages(fetch_page, page_size: int, depth: int):
+    """
+    Fetches pages on a background thread, staying up to `depth` pages ahead
+    of the consumer. Closing the generator stops the thread.
+    """
+    pages = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        offset = 0
+        try:
+            while not stop.is_set():
+                page = fetch_page(page_size, offset)
+                if not page:
+                    break
+                if not put(page):
+                    return
+                offset += page_size
+        except Exception as e:
+            put(e)
+            return
+        put(done)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is done:
+                break
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()
+        worker.join()
+
+
+def lazy_pagination(page_size: int = 100, columnar: bool = False, prefetch: int = 0,
+                    columns=None, where=None, records: bool = False):
+    """
+    Yields one page at a time. With prefetch=k the next k pages are read on
+    a background thread while the current one is being consumed.
+    columns and where (see seed.compile_filter) are pushed into each page query.
+    records=True fills pages with namedtuple records instead of dicts.
+    """
+    def fetch_page(page_size, offset):
+        if columnar:
+            return paginate_user_columns(page_size, offset, columns, where)
+        return paginate_users(page_size, offset, columns, where, records)
+
+    if prefetch > 0:
+        yield from _prefetch_pages(fetch_page, page_size, prefetch)
+        return
+
     offset = 0
     while True:
-        page = paginate_users(page_size, offset)
+        page = fetch_page(page_size, offset)
         if not page:
             break
         yield page
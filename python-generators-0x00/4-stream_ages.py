@@ -1,11 +1,13 @@
-import seed  
+import random
+from MySQLdb.cursors import SSCursor
+import seed
 
 def stream_user_ages():
-  
+
     connection = None
     cursor = None
     try:
-        connection = seed.connect_to_prodev()
+        connection = seed.get_connection()
         if not connection:
             return
 
@@ -24,16 +26,245 @@ def stream_user_ages():
             connection.close()
 
 
-def calculate_average_age():
-    total_age = 0
-    user_count = 0
+def stream_user_age_chunks(chunk_size=1000):
+    """
+    Yields lists of up to chunk_size ages, one fetchmany() per list. The
+    cursor is unbuffered, so only one chunk is held client-side at a time.
+    """
+    connection = seed.get_connection()
+    if not connection:
+        return
+
+    cursor = None
+    try:
+        cursor = connection.cursor(SSCursor)
+        cursor.execute("SELECT age FROM user_data")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [age for (age,) in rows]
+    finally:
+        if cursor:
+            cursor.close()
+        connection.close()
+
+
+def _percentile(sorted_values, pct):
+    # Nearest-rank percentile over an already sorted list.
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class AgeStats:
+    """
+    Single-pass (Welford) accumulator for count/sum/mean/min/max/variance.
+    Percentiles are approximated from a fixed-size reservoir sample.
+    """
+
+    def __init__(self, sample_size=10000, seed_value=None):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sample_size = sample_size
+        self._sample = []
+        self._random = random.Random(seed_value)
+
+    def add(self, value):
+        value = float(value)
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        if len(self._sample) < self.sample_size:
+            self._sample.append(value)
+        else:
+            slot = self._random.randrange(self.count)
+            if slot < self.sample_size:
+                self._sample[slot] = value
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def _merge_moments(self, count, total, mean, m2, low, high):
+        # Chan et al. pairwise combination of two partial aggregates.
+        combined = self.count + count
+        delta = mean - self.mean
+        self._m2 += m2 + delta * delta * self.count * count / combined
+        self.mean += delta * count / combined
+        self.total += total
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.count = combined
+
+    def update_array(self, values):
+        """
+        Vectorized update from a numpy array of ages.
+        """
+        import numpy as np
+
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return
+        seen = self.count
+        mean = float(values.mean())
+        self._merge_moments(
+            int(values.size), float(values.sum()), mean,
+            float(((values - mean) ** 2).sum()),
+            float(values.min()), float(values.max()),
+        )
+
+        # Reservoir sampling as in add(), one array operation per chunk:
+        # fill free slots first, then value i replaces a random slot with
+        # probability sample_size / (its position in the stream).
+        free = self.sample_size - len(self._sample)
+        self._sample.extend(values[:free].tolist())
+        rest = values[max(free, 0):]
+        if rest.size:
+            rng = np.random.default_rng(self._random.getrandbits(64))
+            positions = seen + max(free, 0) + np.arange(1, rest.size + 1)
+            slots = rng.integers(0, positions)
+            keep = slots < self.sample_size
+            sample = np.asarray(self._sample)
+            sample[slots[keep]] = rest[keep]  # later values win, as in add()
+            self._sample = sample.tolist()
 
+    def merge(self, other):
+        """
+        Folds another AgeStats (e.g. from a different partition) into this one.
+        """
+        if not other.count:
+            return
+        count = self.count
+        self._merge_moments(other.count, other.total, other.mean, other._m2,
+                            other.min, other.max)
+
+        # The merged reservoir must be a uniform sample of both streams: the
+        # number of slots taken from `other` is hypergeometric in its share
+        # of the values, and each side is drawn without replacement so
+        # repeated merges don't collapse onto duplicates.
+        size = self.sample_size
+        if len(self._sample) + len(other._sample) <= size:
+            self._sample.extend(other._sample)
+            return
+        theirs = sum(1 for i in self._random.sample(range(self.count), size)
+                     if i >= count)
+        theirs = max(size - len(self._sample), min(theirs, len(other._sample)))
+        self._sample = (self._random.sample(self._sample, size - theirs)
+                        + self._random.sample(other._sample, theirs))
+
+    @property
+    def variance(self):
+        # Population variance, matching MySQL's VAR_POP.
+        return self._m2 / self.count if self.count else None
+
+    def percentiles(self, pcts):
+        ordered = sorted(self._sample)
+        return {pct: _percentile(ordered, pct) for pct in pcts}
+
+    def result(self, percentiles=()):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.mean if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "variance": self.variance,
+            "percentiles": self.percentiles(percentiles),
+        }
+
+
+def _aggregate_ages_sql(percentiles):
+    connection = seed.get_connection()
+    if not connection:
+        raise RuntimeError("no database connection")
+
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT COUNT(age), SUM(age), AVG(age), MIN(age), MAX(age), VAR_POP(age) "
+            "FROM user_data"
+        )
+        count, total, mean, low, high, variance = cursor.fetchone()
+
+        def as_float(value):
+            return float(value) if value is not None else None
+
+        result = {
+            "count": count,
+            "sum": as_float(total) or 0.0,
+            "mean": as_float(mean),
+            "min": as_float(low),
+            "max": as_float(high),
+            "variance": as_float(variance),
+            "percentiles": {},
+        }
 
-    for age in stream_user_ages():
-        total_age += age
-        user_count += 1
+        if percentiles:
+            # Ages have few distinct values, so the histogram is tiny and
+            # gives exact percentiles.
+            cursor.execute(
+                "SELECT age, COUNT(*) FROM user_data GROUP BY age ORDER BY age"
+            )
+            histogram = cursor.fetchall()
+            for pct in percentiles:
+                rank = max(1, -(-count * pct // 100))
+                seen = 0
+                value = None
+                for age, n in histogram:
+                    seen += n
+                    if seen >= rank:
+                        value = float(age)
+                        break
+                result["percentiles"][pct] = value
+        return result
+    finally:
+        if cursor:
+            cursor.close()
+        connection.close()
 
-    average_age = total_age / user_count if user_count else 0
+
+def aggregate_ages(percentiles=(50, 90, 99), push_down=True, chunk_size=1000,
+                   columnar=False):
+    """
+    Returns count, sum, mean, min, max, population variance and the
+    requested percentiles of user ages.
+    With push_down the database computes them, so only a handful of rows
+    cross the wire; otherwise, or if that query fails, ages are streamed in
+    chunks through an AgeStats accumulator (percentiles are then approximate).
+    columnar folds each chunk in as a numpy array instead of value by value.
+    """
+    if push_down:
+        try:
+            return _aggregate_ages_sql(percentiles)
+        except Exception as e:
+            print(f"Falling back to streaming aggregation: {e}")
+
+    stats = AgeStats()
+    for chunk in stream_user_age_chunks(chunk_size):
+        if columnar:
+            stats.update_array(chunk)
+        else:
+            stats.update(chunk)
+    return stats.result(percentiles)
+
+
+def calculate_average_age():
+    stats = aggregate_ages(percentiles=())
+    average_age = stats["mean"] or 0
     print(f"Average age of users: {average_age:.2f}")
 
 
@@ -0,0 +1,184 @@
+import os
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from MySQLdb.cursors import SSCursor
+import seed
+
+stream_ages = __import__('4-stream_ages')
+
+
+def partition_bounds(partitions):
+    """
+    Splits the user_id key space into `partitions` contiguous ranges.
+    user_id is a uuid4 string, so cutting the leading 32 bits evenly gives
+    evenly sized ranges without querying the table first.
+    Returns [(low, high), ...] with low inclusive, high exclusive and None
+    for an open end.
+    """
+    space = 16 ** 8
+    cuts = [format(i * space // partitions, "08x") for i in range(1, partitions)]
+    lows = [None] + cuts
+    highs = cuts + [None]
+    return list(zip(lows, highs))
+
+
+def stream_partition(low, high, batch_size=1000, columns=None, where=None):
+    """
+    Yields user_data rows (as dicts) whose user_id lies in [low, high),
+    walking the primary key through an unbuffered cursor in fetchmany
+    batches, so only one batch is held client-side.
+    columns and where (see seed.compile_filter) are pushed into the query.
+    """
+    select_sql, n_output = seed.compile_projection(
+        columns or ("user_id", "name", "email", "age"))
+    filter_sql, params = seed.compile_filter(where)
+    conditions = [f"({filter_sql})"] if filter_sql else []
+    if low is not None:
+        conditions.append("user_id >= %s")
+        params.append(low)
+    if high is not None:
+        conditions.append("user_id < %s")
+        params.append(high)
+    where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    connection = seed.get_connection()
+    if not connection:
+        return
+
+    cursor = None
+    try:
+        cursor = connection.cursor(SSCursor)
+        cursor.execute(
+            f"SELECT {select_sql} FROM user_data{where_sql} ORDER BY user_id", params
+        )
+        col_names = [desc[0] for desc in cursor.description][:n_output]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(col_names, row))
+    finally:
+        if cursor:
+            cursor.close()
+        connection.close()
+
+
+def _run_partition(func, low, high, batch_size, columns, where):
+    return func(stream_partition(low, high, batch_size, columns, where))
+
+
+def partitioned_scan(func, partitions=None, ordered=True, batch_size=1000,
+                     columns=None, where=None):
+    """
+    Runs func(rows) over every user_id range in its own worker process,
+    each on its own connection, and yields the per-partition results.
+    func must be a picklable (module-level) function taking an iterable of
+    user dicts and should return something small (a count, an AgeStats):
+    each result is pickled back whole. With ordered=True results come back
+    in key order, otherwise as soon as each partition finishes.
+    """
+    partitions = partitions or os.cpu_count() or 1
+    bounds = partition_bounds(partitions)
+
+    with ProcessPoolExecutor(max_workers=partitions) as executor:
+        futures = [
+            executor.submit(_run_partition, func, low, high, batch_size, columns, where)
+            for low, high in bounds
+        ]
+        for future in (futures if ordered else as_completed(futures)):
+            yield future.result()
+
+
+def _send_partition(chunks, low, high, batch_size, columns, where):
+    try:
+        batch = []
+        for row in stream_partition(low, high, batch_size, columns, where):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                chunks.put(batch)
+                batch = []
+        if batch:
+            chunks.put(batch)
+        chunks.put(None)
+    except Exception as e:
+        chunks.put(e)
+
+
+def partitioned_stream(partitions=None, batch_size=1000, columns=None, where=None,
+                       depth=4):
+    """
+    Yields lists of up to batch_size user dicts in user_id order, scanning
+    every partition in its own process. Each worker hands its rows over
+    through a queue of at most depth batches and waits while it is full,
+    so memory stays bounded by partitions * depth * batch_size rows while
+    later partitions scan ahead of the one being consumed.
+    """
+    partitions = partitions or os.cpu_count() or 1
+    workers = []
+    for low, high in partition_bounds(partitions):
+        chunks = multiprocessing.Queue(depth)
+        worker = multiprocessing.Process(
+            target=_send_partition,
+            args=(chunks, low, high, batch_size, columns, where),
+            daemon=True,
+        )
+        worker.start()
+        workers.append((worker, chunks))
+
+    try:
+        for worker, chunks in workers:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=1)
+                except queue.Empty:
+                    if not worker.is_alive():
+                        raise RuntimeError(
+                            f"partition worker exited with code {worker.exitcode}")
+                    continue
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+    finally:
+        for worker, _ in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+
+def _age_stats(users):
+    stats = stream_ages.AgeStats()
+    for user in users:
+        stats.add(user['age'])
+    return stats
+
+
+def parallel_batch_processing(partitions=None, batch_size=1000):
+    """
+    Parallel batch_processing: prints users older than 25, in user_id order.
+    The age filter runs in the database and rows are streamed back in
+    batches rather than collected per partition.
+    """
+    for users in partitioned_stream(partitions, batch_size, where=[("age", ">", 25)]):
+        for user in users:
+            print(user)
+
+
+def parallel_average_age(partitions=None, percentiles=(), batch_size=1000):
+    """
+    Computes the aggregate_ages() statistics with one worker per partition,
+    merging the partial AgeStats as they finish. Only the age column is read.
+    """
+    total = stream_ages.AgeStats()
+    for stats in partitioned_scan(_age_stats, partitions, False, batch_size,
+                                  columns=["age"]):
+        total.merge(stats)
+    return total.result(percentiles)
+
+
+if __name__ == "__main__":
+    stats = parallel_average_age()
+    print(f"Average age of users: {stats['mean'] or 0:.2f}")
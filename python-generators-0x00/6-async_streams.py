@@ -0,0 +1,172 @@
+import asyncio
+import aiomysql
+
+
+async def connect_to_prodev_async():
+    """
+    asyncio counterpart of seed.connect_to_prodev, using aiomysql.
+    """
+    try:
+        return await aiomysql.connect(
+            host="localhost",
+            user="root",
+            password="",
+            db="ALX_prodev",
+            port=3306
+        )
+    except Exception as e:
+        print(f"Error connecting to ALX_prodev: {e}")
+        return None
+
+
+async def _prefetch(fetch_page, depth):
+    """
+    Runs fetch_page() in a background task, keeping up to `depth` pages
+    queued ahead of the consumer. The bounded queue is the backpressure:
+    the producer waits once it is `depth` pages ahead. The producer is
+    cancelled if the consumer stops early.
+    """
+    queue = asyncio.Queue(maxsize=max(1, depth))
+    done = object()
+
+    async def produce():
+        try:
+            while True:
+                page = await fetch_page()
+                if not page:
+                    break
+                await queue.put(page)
+            await queue.put(done)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            page = await queue.get()
+            if page is done:
+                break
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+
+async def async_stream_users(chunk_size=1000):
+    """
+    async for version of stream_users: reads through an unbuffered
+    SSDictCursor, one fetchmany(chunk_size) at a time.
+    """
+    connection = await connect_to_prodev_async()
+    if not connection:
+        return
+
+    try:
+        async with connection.cursor(aiomysql.SSDictCursor) as cursor:
+            await cursor.execute("SELECT * FROM user_data ORDER BY name;")
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+    finally:
+        connection.close()
+
+
+async def async_stream_user_batches(batch_size, prefetch=1):
+    """
+    Yields lists of user dicts using keyset pagination on (name, user_id),
+    fetching up to `prefetch` batches ahead of the consumer.
+    """
+    connection = await connect_to_prodev_async()
+    if not connection:
+        return
+
+    last_key = None
+
+    async def fetch_page():
+        nonlocal last_key
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            if last_key is None:
+                await cursor.execute(
+                    "SELECT user_id, name, email, age FROM user_data "
+                    "ORDER BY name, user_id LIMIT %s",
+                    (batch_size,)
+                )
+            else:
+                name, user_id = last_key
+                await cursor.execute(
+                    "SELECT user_id, name, email, age FROM user_data "
+                    "WHERE name > %s OR (name = %s AND user_id > %s) "
+                    "ORDER BY name, user_id LIMIT %s",
+                    (name, name, user_id, batch_size)
+                )
+            rows = await cursor.fetchall()
+        if rows:
+            last_key = (rows[-1]["name"], rows[-1]["user_id"])
+        return list(rows)
+
+    batches = _prefetch(fetch_page, prefetch)
+    try:
+        async for batch in batches:
+            yield batch
+    finally:
+        await batches.aclose()
+        connection.close()
+
+
+async def async_stream_users_in_batches(batch_size, prefetch=1):
+
+    batches = async_stream_user_batches(batch_size, prefetch)
+    try:
+        async for batch in batches:
+            for user in batch:
+                yield user
+    finally:
+        await batches.aclose()
+
+
+async def async_lazy_pagination(page_size=100, prefetch=1):
+    """
+    async for version of lazy_pagination; page N+1 is fetched while the
+    consumer is still working on page N.
+    """
+    connection = await connect_to_prodev_async()
+    if not connection:
+        return
+
+    offset = 0
+
+    async def fetch_page():
+        nonlocal offset
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(
+                "SELECT * FROM user_data LIMIT %s OFFSET %s",
+                (page_size, offset)
+            )
+            rows = await cursor.fetchall()
+        offset += page_size
+        return list(rows)
+
+    pages = _prefetch(fetch_page, prefetch)
+    try:
+        async for page in pages:
+            yield page
+    finally:
+        await pages.aclose()
+        connection.close()
+
+
+if __name__ == "__main__":
+    async def main():
+        async for page in async_lazy_pagination(100, prefetch=2):
+            for user in page:
+                print(user)
+
+    asyncio.run(main())
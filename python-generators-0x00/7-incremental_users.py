@@ -0,0 +1,87 @@
+import datetime
+import json
+import os
+import seed
+
+
+def load_checkpoint(checkpoint_file):
+    """
+    Returns the last (updated_at, user_id) processed, or None on first run.
+    """
+    try:
+        with open(checkpoint_file, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return datetime.datetime.fromisoformat(data["updated_at"]), data["user_id"]
+
+
+def save_checkpoint(checkpoint_file, key):
+    updated_at, user_id = key
+    tmp_file = checkpoint_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": updated_at.isoformat(), "user_id": user_id}, f)
+    os.replace(tmp_file, checkpoint_file)
+
+
+def stream_changed_users(checkpoint_file, batch_size=1000, safety_lag=5):
+    """
+    Yields only the users inserted or updated since the checkpoint, in
+    (updated_at, user_id) order, using the index added by migration 2.
+    The checkpoint is advanced once a batch has been fully consumed, so an
+    interrupted job resumes at the start of the unfinished batch.
+    Rows touched in the last safety_lag seconds are left for the next run,
+    so transactions that commit late with an older timestamp are not missed.
+    """
+    last_key = load_checkpoint(checkpoint_file)
+
+    connection = seed.get_connection()
+    if not connection:
+        return
+
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT NOW(6) - INTERVAL %s SECOND", (safety_lag,))
+        (horizon,) = cursor.fetchone()
+
+        while True:
+            if last_key is None:
+                cursor.execute(
+                    "SELECT user_id, name, email, age, updated_at FROM user_data "
+                    "WHERE updated_at <= %s "
+                    "ORDER BY updated_at, user_id LIMIT %s",
+                    (horizon, batch_size)
+                )
+            else:
+                updated_at, user_id = last_key
+                cursor.execute(
+                    "SELECT user_id, name, email, age, updated_at FROM user_data "
+                    "WHERE updated_at <= %s "
+                    "AND (updated_at > %s OR (updated_at = %s AND user_id > %s)) "
+                    "ORDER BY updated_at, user_id LIMIT %s",
+                    (horizon, updated_at, updated_at, user_id, batch_size)
+                )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            col_names = [desc[0] for desc in cursor.description]
+            for row in rows:
+                yield dict(zip(col_names, row))
+
+            last_row = dict(zip(col_names, rows[-1]))
+            last_key = (last_row["updated_at"], last_row["user_id"])
+            save_checkpoint(checkpoint_file, last_key)
+
+            if len(rows) < batch_size:
+                break
+    finally:
+        if cursor:
+            cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    for user in stream_changed_users("user_data.checkpoint"):
+        print(user)
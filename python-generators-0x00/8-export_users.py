@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+import argparse
+import bz2
+import csv
+import gzip
+import json
+import lzma
+import time
+from concurrent.futures import ProcessPoolExecutor
+from MySQLdb.cursors import SSCursor
+import seed
+
+partitioned_scan = __import__('5-partitioned_scan')
+
+EXTENSIONS = {"csv": "csv", "ndjson": "ndjson", "parquet": "parquet"}
+TEXT_COMPRESSION = {
+    None: (open, ""),
+    "gzip": (gzip.open, ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+    "xz": (lzma.open, ".xz"),
+}
+
+
+class CsvWriter:
+
+    def __init__(self, path, col_names, compression=None):
+        opener, _ = TEXT_COMPRESSION[compression]
+        self._file = opener(path, "wt", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(col_names)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class NdjsonWriter:
+
+    def __init__(self, path, col_names, compression=None):
+        opener, _ = TEXT_COMPRESSION[compression]
+        self._file = opener(path, "wt", encoding="utf-8")
+        self._col_names = col_names
+
+    def write(self, rows):
+        self._file.writelines(
+            json.dumps(dict(zip(self._col_names, row)), default=str) + "\n"
+            for row in rows
+        )
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Writes each chunk as a Parquet row group. Needs pyarrow; compression is
+    passed through (snappy, gzip, zstd, ...).
+    """
+
+    def __init__(self, path, col_names, compression=None):
+        import pyarrow
+        import pyarrow.parquet
+
+        self._pyarrow = pyarrow
+        self._parquet = pyarrow.parquet
+        self._path = path
+        self._col_names = col_names
+        self._compression = compression or "snappy"
+        self._writer = None
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        table = self._pyarrow.table({
+            name: list(values) for name, values in zip(self._col_names, columns)
+        })
+        if self._writer is None:
+            self._writer = self._parquet.ParquetWriter(
+                self._path, table.schema, compression=self._compression)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "ndjson": NdjsonWriter, "parquet": ParquetWriter}
+
+
+def _file_name(prefix, fmt, compression, part, fileno, numbered):
+    suffix = "" if fmt == "parquet" else TEXT_COMPRESSION[compression][1]
+    if not numbered:
+        return f"{prefix}.{EXTENSIONS[fmt]}{suffix}"
+    return f"{prefix}-{part:03d}-{fileno:05d}.{EXTENSIONS[fmt]}{suffix}"
+
+
+def export_range(prefix, fmt="csv", low=None, high=None, part=0, numbered=False,
+                 chunk_size=10000, rows_per_file=None, compression=None):
+    """
+    Streams the user_data rows with user_id in [low, high) through a
+    server-side cursor into one or more files, fetchmany(chunk_size) at a
+    time, so memory stays bounded by the chunk.
+    A new file is started every rows_per_file rows (if set).
+    Returns (rows_written, file_names).
+    """
+    where = []
+    if low is not None:
+        where.append(("user_id", ">=", low))
+    if high is not None:
+        where.append(("user_id", "<", high))
+    filter_sql, params = seed.compile_filter(where)
+    where_sql = f" WHERE {filter_sql}" if filter_sql else ""
+    numbered = numbered or bool(rows_per_file)
+
+    connection = seed.get_connection()
+    if not connection:
+        return 0, []
+
+    cursor = None
+    writer = None
+    files = []
+    written = 0
+    in_file = 0
+    try:
+        cursor = connection.cursor(SSCursor)
+        cursor.execute(f"SELECT * FROM user_data{where_sql} ORDER BY user_id", params)
+        col_names = [desc[0] for desc in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            while rows:
+                if writer is None:
+                    name = _file_name(prefix, fmt, compression, part, len(files), numbered)
+                    writer = WRITERS[fmt](name, col_names, compression)
+                    files.append(name)
+                    in_file = 0
+                take = len(rows)
+                if rows_per_file:
+                    take = min(take, rows_per_file - in_file)
+                writer.write(rows[:take])
+                written += take
+                in_file += take
+                rows = rows[take:]
+                if rows_per_file and in_file >= rows_per_file:
+                    writer.close()
+                    writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+        if cursor:
+            cursor.close()
+        connection.close()
+    return written, files
+
+
+def export_users(prefix, fmt="csv", chunk_size=10000, rows_per_file=None,
+                 partitions=1, compression=None):
+    """
+    Dumps user_data to prefix.<ext> (or numbered part files when splitting
+    by rows_per_file or partitions). With partitions > 1 each user_id range
+    is exported by its own process into its own files.
+    Prints and returns rows, files, seconds and rows/sec.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt!r}")
+    if fmt != "parquet" and compression not in TEXT_COMPRESSION:
+        raise ValueError(f"Unsupported compression for {fmt}: {compression!r}")
+
+    started = time.perf_counter()
+    if partitions > 1:
+        with ProcessPoolExecutor(max_workers=partitions) as executor:
+            futures = [
+                executor.submit(export_range, prefix, fmt, low, high, part, True,
+                                chunk_size, rows_per_file, compression)
+                for part, (low, high) in enumerate(partitioned_scan.partition_bounds(partitions))
+            ]
+            results = [future.result() for future in futures]
+    else:
+        results = [export_range(prefix, fmt, chunk_size=chunk_size,
+                                rows_per_file=rows_per_file, compression=compression)]
+
+    elapsed = time.perf_counter() - started
+    rows = sum(written for written, _ in results)
+    files = [name for _, names in results for name in names]
+    rate = rows / elapsed if elapsed else 0
+    print(f"Exported {rows} rows to {len(files)} file(s) in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    return {"rows": rows, "files": files, "seconds": elapsed, "rows_per_sec": rate}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export user_data in chunks.")
+    parser.add_argument("prefix", help="output path without extension")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--rows-per-file", type=int)
+    parser.add_argument("--partitions", type=int, default=1)
+    parser.add_argument("--compression",
+                        help="gzip, bz2 or xz for csv/ndjson; any pyarrow codec for parquet")
+    args = parser.parse_args()
+
+    export_users(args.prefix, args.format, args.chunk_size, args.rows_per_file,
+                 args.partitions, args.compression)
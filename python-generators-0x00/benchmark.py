@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+"""
+Benchmark harness for the python-generators-0x00 streaming functions.
+
+Fully consumes each generator in a fresh child process and reports
+throughput, time-to-first-row, peak RSS and the number of SELECTs the
+server saw. The generators read ALX_prodev.user_data, so by default the
+table is benchmarked as it is; --reset replaces its contents with N
+synthetic rows for each of --sizes first (only do that on a scratch
+server). Results can be saved as a JSON baseline and compared later:
+
+    python3 benchmark.py --reset --sizes 10000 1000000 --save baseline.json
+    python3 benchmark.py --reset --sizes 10000 1000000 --compare baseline.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import queue
+import random
+import resource
+import time
+import uuid
+import seed
+
+GENERATORS = {
+    "stream_users": lambda: __import__('0-stream_users').stream_users(),
+    "stream_users_in_batches": lambda: __import__('1-batch_processing').stream_users_in_batches(1000),
+    "lazy_pagination": lambda: __import__('2-lazy_paginate').lazy_pagination(1000),
+    "stream_user_ages": lambda: __import__('4-stream_ages').stream_user_ages(),
+}
+
+
+def seed_synthetic(rows, chunk_size=10000, random_seed=42):
+    """
+    Replaces user_data with `rows` deterministic synthetic users, creating
+    and migrating the table first if needed.
+    """
+    connection = seed.connect_to_prodev()
+    if not connection:
+        raise RuntimeError("no database connection")
+    seed.create_table(connection)
+    cursor = connection.cursor()
+    cursor.execute("TRUNCATE TABLE user_data")
+    rng = random.Random(random_seed)
+    chunk = []
+    for i in range(rows):
+        chunk.append((
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            f"User {rng.randrange(rows)}",
+            f"user{i}@example.com",
+            rng.randint(18, 100),
+        ))
+        if len(chunk) >= chunk_size:
+            cursor.executemany(
+                "INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
+                chunk
+            )
+            connection.commit()
+            chunk = []
+    if chunk:
+        cursor.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
+            chunk
+        )
+    connection.commit()
+    cursor.close()
+    connection.close()
+
+
+def _select_count():
+    # Server-wide counter; good enough on an otherwise idle local server.
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return None
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Com_select'")
+        row = cursor.fetchone()
+        cursor.close()
+        return int(row[1]) if row else None
+    except Exception:
+        return None
+    finally:
+        connection.close()
+
+
+def _measure(name, results):
+    try:
+        results.put(_run_generator(name))
+    except Exception as e:
+        results.put({"error": str(e)})
+
+
+def _run_generator(name):
+    before = _select_count()
+    started = time.perf_counter()
+    first_row = None
+    rows = 0
+    for item in GENERATORS[name]():
+        if first_row is None:
+            first_row = time.perf_counter() - started
+        rows += len(item) if isinstance(item, list) else 1
+    elapsed = time.perf_counter() - started
+    after = _select_count()
+
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() != "Darwin":
+        peak_rss *= 1024
+
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed else None,
+        "time_to_first_row": first_row,
+        "peak_rss_bytes": peak_rss,
+        # Minus the one issued by the second _select_count itself.
+        "queries": after - before - 1 if None not in (before, after) else None,
+    }
+
+
+def measure(name, timeout=None):
+    """
+    Runs one generator to exhaustion in a child process, so peak RSS and
+    pooled connections belong to that run alone. A child that dies (e.g.
+    OOM-killed) or runs past timeout seconds is reported as an error.
+    """
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=_measure, args=(name, results))
+    worker.start()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    while True:
+        try:
+            result = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not worker.is_alive():
+                result = {"error": f"worker exited with code {worker.exitcode}"}
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                worker.terminate()
+                result = {"error": f"timed out after {timeout}s"}
+                break
+    worker.join()
+    return result
+
+
+def _row_count():
+    connection = seed.connect_to_prodev()
+    if not connection:
+        raise RuntimeError("no database connection")
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM user_data")
+        (count,) = cursor.fetchone()
+        cursor.close()
+        return count
+    finally:
+        connection.close()
+
+
+def run(sizes, names, reset=False, timeout=None):
+    """
+    With reset, seeds and benchmarks each of sizes in turn; otherwise
+    benchmarks user_data as it is, keyed by its current row count.
+    """
+    report = {"sizes": {}}
+    if not reset:
+        sizes = [_row_count()]
+    for size in sizes:
+        if reset:
+            print(f"Seeding {size} rows...")
+            seed_synthetic(size)
+        report["sizes"][str(size)] = {}
+        for name in names:
+            result = measure(name, timeout)
+            report["sizes"][str(size)][name] = result
+            if "error" in result:
+                print(f"  {name:<24} failed: {result['error']}")
+                continue
+            print(
+                f"  {name:<24} {result['rows_per_sec'] or 0:>12.0f} rows/s"
+                f"  first row {result['time_to_first_row'] or 0:.4f}s"
+                f"  peak RSS {result['peak_rss_bytes'] / 2 ** 20:.1f} MiB"
+                f"  queries {result['queries']}"
+            )
+    return report
+
+
+def compare(report, baseline):
+    for size, current in report["sizes"].items():
+        previous = baseline.get("sizes", {}).get(size)
+        if not previous:
+            continue
+        print(f"{size} rows vs baseline:")
+        for name, result in current.items():
+            old = previous.get(name)
+            if not old or not old.get("rows_per_sec") or not result.get("rows_per_sec"):
+                continue
+            change = (result["rows_per_sec"] / old["rows_per_sec"] - 1) * 100
+            print(f"  {name:<24} throughput {change:+.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reset", action="store_true",
+                        help="replace ALX_prodev.user_data with synthetic rows")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 1000000, 10000000],
+                        help="row counts to seed (with --reset)")
+    parser.add_argument("--timeout", type=float,
+                        help="seconds allowed per generator run")
+    parser.add_argument("--only", nargs="+", choices=sorted(GENERATORS),
+                        default=sorted(GENERATORS))
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON baseline to compare against")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.only, args.reset, args.timeout)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -1,6 +1,16 @@
+import collections
 import csv
+import decimal
+import functools
+import itertools
+import os
+import re
+import threading
+import time
 import uuid
 import MySQLdb
+import MySQLdb.converters
+from MySQLdb.constants import FIELD_TYPE
 
 
 
@@ -30,17 +40,36 @@ def create_database(con):
         print(f"Error creating database: {e}")
 
 
-def connect_to_prodev():
+def _native_number(value):
+    # DECIMAL arrives as text; integral values become int, the rest float.
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+NATIVE_NUMBER_CONVERSIONS = dict(MySQLdb.converters.conversions)
+NATIVE_NUMBER_CONVERSIONS[FIELD_TYPE.DECIMAL] = _native_number
+NATIVE_NUMBER_CONVERSIONS[FIELD_TYPE.NEWDECIMAL] = _native_number
+
+
+def connect_to_prodev(native_numbers=False):
     """
     Connects directly to the ALX_prodev database.
+    With native_numbers=True, DECIMAL results (including SUM/AVG) come back
+    as int/float instead of decimal.Decimal.
     """
     try:
+        options = {}
+        if native_numbers:
+            options["conv"] = NATIVE_NUMBER_CONVERSIONS
         connection = MySQLdb.connect(
             host="localhost",
             user="root",
             passwd="",
             db="ALX_prodev",
-            port=3306
+            port=3306,
+            **options
         )
         return connection
     except Exception as e:
@@ -48,6 +77,307 @@ def connect_to_prodev():
         return None
 
 
+class PooledConnection:
+    """
+    Wraps a pooled MySQLdb connection; close() hands it back to the pool
+    instead of closing the socket.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            self._pool.release(self._raw)
+            self._raw = None
+
+
+class ConnectionPool:
+    """
+    Bounded pool of ALX_prodev connections.
+    Idle connections older than max_idle seconds are dropped, and ones idle
+    longer than ping_after seconds are pinged before being handed out.
+    Connections are opened with native_numbers=True by default.
+    """
+
+    def __init__(self, max_size=10, max_idle=300, ping_after=30, timeout=30,
+                 connect=functools.partial(connect_to_prodev, native_numbers=True)):
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self.timeout = timeout
+        self._connect = connect
+        self._idle = []  # (connection, released_at), most recent last
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.stats = {
+            "checkouts": 0,
+            "connects": 0,
+            "reused": 0,
+            "discarded": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+        }
+
+    def _healthy(self, raw, idle_for):
+        if idle_for > self.max_idle:
+            return False
+        if idle_for > self.ping_after:
+            try:
+                raw.ping()
+            except Exception:
+                return False
+        return True
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _unreserve(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if not self._idle and self._in_use >= self.max_size:
+                self.stats["waits"] += 1
+                started = time.monotonic()
+                while not self._idle and self._in_use >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        print("Error connecting to ALX_prodev: pool exhausted")
+                        return None
+                    self._cond.wait(remaining)
+                self.stats["wait_seconds"] += time.monotonic() - started
+            # Reserve a slot, then ping or connect without holding the lock:
+            # a dead server must not stall every other acquire and release.
+            self._in_use += 1
+            candidate = self._idle.pop() if self._idle else None
+
+        try:
+            while candidate is not None:
+                raw, released_at = candidate
+                if self._healthy(raw, time.monotonic() - released_at):
+                    with self._cond:
+                        self.stats["checkouts"] += 1
+                        self.stats["reused"] += 1
+                    return PooledConnection(self, raw)
+                self._close_quietly(raw)
+                with self._cond:
+                    self.stats["discarded"] += 1
+                    candidate = self._idle.pop() if self._idle else None
+            raw = self._connect()
+        except BaseException:
+            self._unreserve()
+            raise
+        if raw is None:
+            self._unreserve()
+            return None
+
+        with self._cond:
+            self.stats["checkouts"] += 1
+            self.stats["connects"] += 1
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        try:
+            # End the read snapshot so the next borrower sees fresh data.
+            raw.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                self.stats["discarded"] += 1
+            self._cond.notify()
+        if not healthy:
+            self._close_quietly(raw)
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                raw, _ = self._idle.pop()
+                raw.close()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_inherited_pools = []
+
+
+def get_pool():
+    """
+    Returns the process-wide ConnectionPool, creating it on first use
+    (and again after a fork, since sockets can't be shared with the parent).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if _pool is not None:
+                # Keep the parent's connections alive in the child: letting
+                # them be collected would close sockets the parent still uses.
+                _inherited_pools.append(_pool)
+            _pool = ConnectionPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def get_connection():
+    """
+    Borrows a connection from the shared pool; close() returns it.
+    """
+    return get_pool().acquire()
+
+
+USER_DATA_COLUMNS = ("user_id", "name", "email", "age", "updated_at")
+FILTER_OPERATORS = ("=", "!=", "<>", "<", "<=", ">", ">=", "LIKE", "IN")
+_FILTER_LITERAL = re.compile(r"'(?:[^']|'')*'|-?\d+(?:\.\d+)?")
+_FILTER_CONDITION = re.compile(
+    r"\s*(\w+)(?:\s*(<=|>=|!=|<>|=|<|>|LIKE\b)\s*({lit})"
+    r"|\s+(IN)\s*\(\s*((?:{lit})(?:\s*,\s*(?:{lit}))*)\s*\))\s*".format(
+        lit=_FILTER_LITERAL.pattern),
+    re.IGNORECASE,
+)
+_FILTER_AND = re.compile(r"AND\b", re.IGNORECASE)
+
+
+def compile_projection(columns=None, required=()):
+    """
+    Builds the SELECT list for user_data.
+    Returns (select_sql, n_output): the requested columns come first, followed
+    by any `required` ones the caller needs internally (e.g. paging keys);
+    n_output is how many leading columns belong in the result, or None for
+    all of them. columns=None selects every column.
+    """
+    if columns is None:
+        return "*", None
+    columns = list(columns)
+    for column in list(columns) + list(required):
+        if column not in USER_DATA_COLUMNS:
+            raise ValueError(f"Unknown user_data column: {column!r}")
+    selected = columns + [c for c in required if c not in columns]
+    return ", ".join(selected), len(columns)
+
+
+def _filter_value(literal):
+    if literal.startswith("'"):
+        return literal[1:-1].replace("''", "'")
+    if "." in literal:
+        return float(literal)
+    return int(literal)
+
+
+def _parse_filter(where):
+    # "age > 25 and name = 'Bob'" -> [("age", ">", 25), ("name", "=", "Bob")]
+    # Conditions are matched left to right, so AND inside a quoted literal
+    # stays part of the value.
+    conditions = []
+    pos = 0
+    while True:
+        match = _FILTER_CONDITION.match(where, pos)
+        if not match:
+            raise ValueError(f"Unsupported filter condition: {where[pos:].strip()!r}")
+        column, op, literal, in_op, in_list = match.groups()
+        if in_op:
+            values = [_filter_value(v) for v in _FILTER_LITERAL.findall(in_list)]
+            conditions.append((column, "IN", values))
+        else:
+            conditions.append((column, op.upper(), _filter_value(literal)))
+        pos = match.end()
+        if pos == len(where):
+            return conditions
+        separator = _FILTER_AND.match(where, pos)
+        if not separator:
+            raise ValueError(f"Unsupported filter condition: {where[pos:].strip()!r}")
+        pos = separator.end()
+
+
+def compile_filter(where=None):
+    """
+    Turns a simple filter into a parameterized SQL condition.
+    `where` is either a string of comparisons joined by AND
+    ("age > 25 and email like '%@example.com' and age in (30, 40)") or a
+    list of (column, operator, value) tuples; IN takes a sequence value.
+    Returns (sql, params), with sql == "" when there is no filter.
+    """
+    if not where:
+        return "", []
+    conditions = _parse_filter(where) if isinstance(where, str) else where
+
+    clauses = []
+    params = []
+    for column, op, value in conditions:
+        op = op.upper()
+        if column not in USER_DATA_COLUMNS:
+            raise ValueError(f"Unknown user_data column: {column!r}")
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op!r}")
+        if op == "IN":
+            values = list(value)
+            if not values:
+                raise ValueError(f"Empty IN list for column {column!r}")
+            clauses.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+            params.extend(values)
+        else:
+            clauses.append(f"{column} {op} %s")
+            params.append(value)
+    return " AND ".join(clauses), params
+
+
+@functools.lru_cache(maxsize=None)
+def record_type(col_names):
+    """
+    Returns a namedtuple class for a tuple of column names. Classes are
+    cached per column layout, so the field mapping is built once rather
+    than zipped into a fresh dict for every row; each record is a plain
+    tuple with no per-instance __dict__.
+    """
+    return collections.namedtuple("UserRecord", col_names)
+
+
+def record_maker(col_names):
+    """
+    Returns a function turning a row tuple into a record_type(col_names)
+    instance, ignoring any trailing columns beyond col_names.
+    """
+    make = record_type(tuple(col_names))._make
+    width = len(col_names)
+    return lambda row: make(row[:width]) if len(row) > width else make(row)
+
+
+def rows_to_columns(col_names, rows):
+    """
+    Transposes a page of row tuples into {column: numpy array}.
+    Numeric columns (including DECIMAL) become float64 arrays so they can be
+    filtered and aggregated without touching Python objects; the rest stay
+    object arrays.
+    """
+    import numpy as np
+
+    columns = {}
+    for name, values in zip(col_names, zip(*rows)):
+        if values and isinstance(values[0], (int, float, decimal.Decimal)):
+            columns[name] = np.asarray(values, dtype=np.float64)
+        else:
+            columns[name] = np.asarray(values, dtype=object)
+    return columns
+
+
 def create_table(connection):
   
 
@@ -69,6 +399,113 @@ def create_table(connection):
         print("Table user_data created successfully")
     except Exception as e:
         print(f"Error creating table: {e}")
+        return
+    migrate(connection)
+
+
+def _index_exists(index):
+    return (
+        "SELECT COUNT(*) > 0 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = 'user_data' "
+        f"AND index_name = '{index}'"
+    )
+
+
+def _column_is(column, data_type=None):
+    condition = f" AND data_type = '{data_type}'" if data_type else ""
+    return (
+        "SELECT COUNT(*) > 0 FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = 'user_data' "
+        f"AND column_name = '{column}'{condition}"
+    )
+
+
+# Each entry is (version, description, steps), where a step is
+# (statement, done): done is a query that returns true once the statement
+# has taken effect. MySQL commits each DDL statement on its own, so a
+# migration that fails halfway is rerun from the top and skips the steps
+# that already went through. Append new entries with the next version
+# number; never edit one that has already shipped.
+MIGRATIONS = [
+    (
+        1,
+        "unique email index, (name, user_id) index, drop redundant user_id index",
+        [
+            ("ALTER TABLE user_data ADD UNIQUE INDEX idx_user_data_email (email)",
+             _index_exists("idx_user_data_email")),
+            ("ALTER TABLE user_data ADD INDEX idx_user_data_name_id (name, user_id)",
+             _index_exists("idx_user_data_name_id")),
+            ("ALTER TABLE user_data DROP INDEX user_id",
+             f"SELECT NOT ({_index_exists('user_id')})"),
+        ],
+    ),
+    (
+        2,
+        "updated_at change-tracking column with (updated_at, user_id) index",
+        [
+            ("ALTER TABLE user_data ADD COLUMN updated_at TIMESTAMP(6) NOT NULL "
+             "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+             _column_is("updated_at")),
+            ("ALTER TABLE user_data ADD INDEX idx_user_data_updated (updated_at, user_id)",
+             _index_exists("idx_user_data_updated")),
+        ],
+    ),
+    (
+        3,
+        "store age as INT instead of DECIMAL",
+        [
+            # DECIMAL defaults to DECIMAL(10,0), so every stored age is integral.
+            ("ALTER TABLE user_data MODIFY age INT NOT NULL",
+             _column_is("age", "int")),
+        ],
+    ),
+]
+
+
+def get_schema_version(connection):
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    (version,) = cursor.fetchone()
+    cursor.close()
+    return version or 0
+
+
+def migrate(connection, target=None):
+    """
+    Applies every migration newer than the recorded schema version,
+    up to target (default: latest). Returns the resulting version.
+    """
+    try:
+        current = get_schema_version(connection)
+        cursor = connection.cursor()
+        for version, description, steps in MIGRATIONS:
+            if version <= current or (target is not None and version > target):
+                continue
+            for statement, done in steps:
+                cursor.execute(done)
+                if not cursor.fetchone()[0]:
+                    cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+            connection.commit()
+            current = version
+            print(f"Applied migration {version}: {description}")
+        cursor.close()
+        return current
+    except Exception as e:
+        print(f"Error migrating schema: {e}")
+        return None
 
 
 def insert_data(connection, csv_file):
@@ -95,4 +532,100 @@ def insert_data(connection, csv_file):
         connection.commit()
         cursor.close()
     except Exception as e:
-        print(f"Error inserting data: {e}")
\ No newline at end of file
+        print(f"Error inserting data: {e}")
+
+def _read_checkpoint(checkpoint_file):
+    try:
+        with open(checkpoint_file, encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_checkpoint(checkpoint_file, rows_done):
+    tmp_file = checkpoint_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(str(rows_done))
+    os.replace(tmp_file, checkpoint_file)
+
+
+def bulk_insert_data(connection, csv_file, chunk_size=1000, commit_every=10000,
+                     dedupe="index", checkpoint_file=None):
+    """
+    Bulk version of insert_data: streams the CSV in chunks and loads each
+    chunk with one multi-row INSERT IGNORE instead of a SELECT plus an
+    INSERT per row.
+
+    dedupe="index" (the default) leaves duplicates to the UNIQUE index on
+    email added by migration 1; dedupe="set" instead loads every existing
+    email into memory once and skips duplicates in Python, for tables that
+    have not been migrated.
+    The number of CSV rows committed is written to checkpoint_file
+    (default: <csv_file>.checkpoint), and a rerun resumes from there.
+    Returns the number of rows actually inserted, as reported by the
+    database (rows ignored as duplicates are not counted).
+    """
+    if checkpoint_file is None:
+        checkpoint_file = csv_file + ".checkpoint"
+    insert_sql = (
+        "INSERT IGNORE INTO user_data (user_id, name, email, age) "
+        "VALUES (%s, %s, %s, %s)"
+    )
+
+    try:
+        cursor = connection.cursor()
+        seen_emails = set()
+        if dedupe == "set":
+            cursor.execute("SELECT email FROM user_data")
+            seen_emails.update(email for (email,) in cursor.fetchall())
+
+        skip = _read_checkpoint(checkpoint_file)
+        if skip:
+            print(f"Resuming {csv_file} after row {skip}")
+
+        rows_done = skip
+        inserted = 0
+        uncommitted = 0
+        chunk = []
+        started = time.perf_counter()
+
+        def flush():
+            nonlocal inserted, uncommitted
+            if chunk:
+                cursor.executemany(insert_sql, chunk)
+                inserted += max(cursor.rowcount, 0)
+                uncommitted += len(chunk)
+                chunk.clear()
+
+        def commit():
+            nonlocal uncommitted
+            connection.commit()
+            _write_checkpoint(checkpoint_file, rows_done)
+            uncommitted = 0
+            elapsed = time.perf_counter() - started
+            rate = (rows_done - skip) / elapsed if elapsed else 0
+            print(f"Committed {rows_done} rows ({rate:.0f} rows/sec)")
+
+        with open(csv_file, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in itertools.islice(reader, skip, None):
+                rows_done += 1
+                email = row["email"]
+                if dedupe == "set":
+                    if email in seen_emails:
+                        continue
+                    seen_emails.add(email)
+                chunk.append((str(uuid.uuid4()), row["name"], email, row["age"]))
+
+                if len(chunk) >= chunk_size:
+                    flush()
+                    if uncommitted >= commit_every:
+                        commit()
+        flush()
+        commit()
+        cursor.close()
+        os.remove(checkpoint_file)
+        return inserted
+    except Exception as e:
+        print(f"Error bulk inserting data: {e}")
+        return None
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+import random
+import statistics
+
+stream_ages = __import__('4-stream_ages')
+
+rng = random.Random(1)
+ages = [rng.randint(18, 100) for _ in range(20000)]
+assert len(set(ages)) > 50
+
+stats = stream_ages.AgeStats(seed_value=1)
+stats.update(ages)
+assert stats.count == len(ages)
+assert abs(stats.total - sum(ages)) < 1e-6
+assert abs(stats.mean - statistics.fmean(ages)) < 1e-9
+assert abs(stats.variance - statistics.pvariance(ages)) < 1e-6
+assert (stats.min, stats.max) == (min(ages), max(ages))
+assert len(stats._sample) == 10000
+median = stats.percentiles([50])[50]
+assert abs(median - statistics.median(ages)) <= 3
+print("AgeStats.update: OK")
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if np is not None:
+    # Folding many small chunks must not collapse the reservoir.
+    columnar = stream_ages.AgeStats(sample_size=10000, seed_value=4)
+    values = np.arange(1000000)
+    for start in range(0, values.size, 1000):
+        columnar.update_array(values[start:start + 1000])
+    assert columnar.count == values.size
+    assert abs(columnar.mean - 499999.5) < 1e-6
+    assert len(set(columnar._sample)) == 10000
+    assert abs(statistics.fmean(columnar._sample) - 500000) < 15000
+
+    skewed = np.concatenate([np.full(800000, 20), np.arange(200000) % 80 + 21])
+    np.random.default_rng(5).shuffle(skewed)
+    columnar = stream_ages.AgeStats(seed_value=6)
+    for start in range(0, skewed.size, 1000):
+        columnar.update_array(skewed[start:start + 1000])
+    exact = np.sort(skewed)[899999]
+    assert abs(columnar.percentiles([90])[90] - exact) <= 3
+    print("AgeStats.update_array: OK")
+
+# Partial accumulators (one per partition) merge to the same moments, and
+# the merged sample keeps each side in proportion without duplicates.
+left = stream_ages.AgeStats(sample_size=1000, seed_value=2)
+left.update(range(90000))
+right = stream_ages.AgeStats(sample_size=1000, seed_value=3)
+right.update(range(90000, 100000))
+left.merge(right)
+assert left.count == 100000
+assert abs(left.mean - 49999.5) < 1e-6
+assert abs(left.variance - statistics.pvariance(range(100000))) < 1e-3
+assert (left.min, left.max) == (0, 99999)
+assert len(left._sample) == len(set(left._sample)) == 1000
+assert 50 <= sum(v >= 90000 for v in left._sample) <= 150
+print("AgeStats.merge: OK")
@@ -0,0 +1,22 @@
+#!/usr/bin/python3
+seed = __import__('seed')
+
+assert seed.compile_filter(None) == ("", [])
+assert seed.compile_filter("age > 25") == ("age > %s", [25])
+assert seed.compile_filter("name = 'Tom and Jerry'") == ("name = %s", ["Tom and Jerry"])
+assert seed.compile_filter("name = 'O''Brien' AND age <= 30.5") == \
+    ("name = %s AND age <= %s", ["O'Brien", 30.5])
+assert seed.compile_filter("age in (1, 2) and email like '%@example.com'") == \
+    ("age IN (%s, %s) AND email LIKE %s", [1, 2, "%@example.com"])
+assert seed.compile_filter([("age", "in", (3,)), ("name", "!=", "x")]) == \
+    ("age IN (%s) AND name != %s", [3, "x"])
+print("compile_filter: OK")
+
+for bad in ["age > 25 or 1 = 1", "age > 25 and", "password = 'x'", "age ~ 3",
+            [("age", "in", ())]]:
+    try:
+        seed.compile_filter(bad)
+        raise AssertionError(f"accepted {bad!r}")
+    except ValueError:
+        pass
+print("compile_filter rejects unsupported filters: OK")